@@ -6,3 +6,8 @@ import setup
 def hook(config):
     if sys.version_info[0] < 3:
         sys.path.insert(0, setup.PY2K_DIR)
+    elif any(arg.startswith("build") or
+             arg.startswith("install") or
+             arg.startswith("bdist") for arg in sys.argv):
+        from translit.generate_iconv_tables import generate_iconv_tables
+        generate_iconv_tables()
@@ -1,9 +1,44 @@
 #!/usr/bin/env python3
 
+import codecs
+import contextlib
+import importlib
+import io
+import os
+import shutil
+import tempfile
 import unittest
+import warnings
 from collections import namedtuple
+from unittest import mock
 
 import translit #@UnusedImport
+from translit.downgrade import (attach_shared_tables, cache_info,
+                                export_shared_tables, memo_info, purge,
+                                set_cache_size, set_disk_cache,
+                                set_hit_counting, set_memo_size,
+                                save_disk_cache)
+from translit.upgrade import (memo_info as upgrade_memo_info,
+                              set_memo_size as set_upgrade_memo_size)
+
+# translit.downgrade is the function, not the module.
+downgrade_module = importlib.import_module("translit.downgrade")
+
+try:
+    from translit._downgrade import translate
+except ImportError:
+    translate = None
+
+try:
+    from translit import vectorized
+except ImportError:
+    vectorized = None
+
+try:
+    import pandas
+    import pyarrow
+except ImportError:
+    pandas = pyarrow = None
 
 
 Result = namedtuple("Result", ("text", "encoding"))
@@ -89,6 +124,314 @@ class TestTranslit(unittest.TestCase):
                     "{}/translit/{}".format(result.encoding, language))
                 self.assertEqual(decoded_text, result.text)
 
+    def test_transliterator(self):
+        text = "“œuvre” – «\u202fÆsir\u202f»"
+        for encoding in ["ascii", "latin-1"]:
+            transliterator = translit.Transliterator(encoding, "fr")
+            downgraded = translit.downgrade(text, encoding)
+            self.assertEqual(transliterator.downgrade(text), downgraded)
+            self.assertEqual(transliterator.encode(text),
+                             text.encode(encoding + "/translit"))
+            self.assertEqual(transliterator.upgrade(downgraded),
+                             translit.upgrade(downgraded, "fr"))
+        transliterator = translit.Transliterator("latin-1", mode="unidecode")
+        self.assertEqual(transliterator.downgrade(text),
+                         translit.unidecode(text))
+        self.assertRaises(ValueError, translit.Transliterator, mode="x")
+
+    def test_unknown_encoding(self):
+        # ASCII text is returned before the encoding is looked up.
+        self.assertEqual(translit.downgrade("abc", "no-such-encoding"), "abc")
+        self.assertRaises(LookupError, translit.downgrade, "é",
+                          "no-such-encoding")
+        self.assertRaises(LookupError, translit.downgrade_many, ["abc"],
+                          "no-such-encoding")
+
+    def test_downgrade_table(self):
+        table = translit.get_downgrade_table("latin-1")
+        self.assertIs(table, translit.get_downgrade_table("iso-8859-1"))
+        text = "“œuvre” – 37.0\u202f℃"
+        self.assertEqual(text.translate(table),
+                         translit.downgrade(text, "latin-1"))
+
+    def test_error_handler(self):
+        text = "“œuvre” – 37.0\u202f℃"
+        self.assertEqual(text.encode("latin-1", "translit"),
+                         translit.downgrade(text, "latin-1").encode("latin-1"))
+        # Charmap codecs, which all report "charmap" as their encoding.
+        for encoding in ["cp1252", "cp437", "iso8859-15", "koi8-r"]:
+            table = translit.get_downgrade_table(encoding)
+            for n in range(0x80, 0x3000):
+                c = chr(n)
+                self.assertEqual(c.encode(encoding, "translit"),
+                                 c.translate(table).encode(encoding))
+        for text, encoding in [("\x81Ǆ", "cp1252"), ("¾", "cp437"),
+                               ("¤", "iso8859-15")]:
+            self.assertEqual(text.encode(encoding, "translit"),
+                             translit.downgrade(text, encoding).encode(
+                                 encoding))
+
+    def test_needs_downgrade(self):
+        text = "«\u202fœuvre\u202f» 中文"
+        for encoding, index in [("ascii", 0), ("latin-1", 1),
+                                ("cp1252", 1), ("shift_jis", 0),
+                                ("gb18030", -1)]:
+            self.assertEqual(translit.first_unencodable(text, encoding), index)
+            self.assertEqual(translit.needs_downgrade(text, encoding),
+                             index != -1)
+        self.assertEqual(translit.first_unencodable("中文 œuvre", "gbk"), 3)
+        self.assertFalse(translit.needs_downgrade("plain", "ascii"))
+
+    def test_stream_writer(self):
+        text = "«\u202fÆsir\u202f» « Œ\n»"
+        for encoding in ["ascii", "latin-1"]:
+            encoding += "/translit"
+            stream = io.BytesIO()
+            writer = codecs.getwriter(encoding)(stream)
+            writer.writelines([text[:3], text[3:]])
+            self.assertEqual(stream.getvalue(), text.encode(encoding))
+            for n in range(len(text) + 1):
+                expected = (text[:n].encode(encoding) +
+                            text[n:].encode(encoding))
+                stream = io.BytesIO()
+                writer = codecs.getwriter(encoding)(stream)
+                writer.write(text[:n])
+                writer.write(text[n:])
+                self.assertEqual(stream.getvalue(), expected)
+                self.assertEqual(b"".join(codecs.iterencode(
+                    [text[:n], text[n:]], encoding)), expected)
+
+    def test_codec_files(self):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            for text, encoding in [("hello world\n", "ascii"),
+                                   ("« Æsir » Œ", "latin-1"),
+                                   ("a" * 8191 + " - b\n", "ascii")]:
+                expected = translit.downgrade(text, encoding)
+                encoding += "/translit/en"
+                with open(path, "w", encoding=encoding) as f:
+                    f.write(text)
+                with open(path, encoding=encoding) as f:
+                    self.assertEqual(f.read(),
+                                     translit.upgrade(expected, "en"))
+                with codecs.open(path, "w", encoding) as f:
+                    f.write(text)
+                with codecs.open(path, "r", encoding) as f:
+                    self.assertEqual(list(f), translit.upgrade(
+                        expected, "en").splitlines(True))
+        finally:
+            os.remove(path)
+
+    def test_iter_downgrade(self):
+        text = "«\u202fÆsir\u202f» « Œ\n»"
+        for encoding in ["ascii", "latin-1"]:
+            expected = translit.downgrade(text, encoding)
+            for n in range(len(text) + 1):
+                chunks = [text[:n], "", text[n:]]
+                self.assertEqual(
+                    "".join(translit.iter_downgrade(chunks, encoding)),
+                    expected)
+
+    def test_parallel_downgrade(self):
+        text = "« Æsir » « Œ\n»" * 100000
+        for encoding in ["ascii", "latin-1"]:
+            self.assertEqual(translit.downgrade(text, encoding, workers=3),
+                             translit.downgrade(text, encoding))
+
+    def test_downgrade_many(self):
+        texts = ["“œuvre”", "Æsir", "ascii", "“œuvre”", "37.0 ℃"] * 3
+        expected = [translit.downgrade(text, "ascii") for text in texts]
+        self.assertEqual(translit.downgrade_many(texts, "ascii"), expected)
+        self.assertEqual(translit.downgrade_many(iter(texts), "ascii",
+                                                 workers=2, chunksize=1),
+                         expected)
+
+    def test_cache(self):
+        text = "".join(chr(n) for n in range(0x100, 0x150))
+        try:
+            set_cache_size(64)
+            translit.downgrade(text, "ascii")
+            translit.downgrade(text, "latin-1")
+            info = cache_info()
+            self.assertLessEqual(info.currsize, 64)
+            self.assertEqual(info.misses, 2 * len(text))
+            self.assertIsNone(info.hits)
+            set_hit_counting()
+            translit.downgrade(text[-8:] + "a" * 100, "latin-1")
+            self.assertEqual(cache_info("latin-1").hits, 8)
+            purge("latin-1")
+            self.assertEqual(cache_info("latin-1").currsize, 0)
+            self.assertEqual(cache_info().currsize,
+                             cache_info("ascii").currsize)
+        finally:
+            set_hit_counting(False)
+            set_cache_size()
+            purge()
+
+    def test_memo(self):
+        text = "“œuvre” – 37.0\u202f℃"
+        expected = translit.downgrade(text, "ascii")
+        try:
+            set_memo_size(2, max_length=len(text))
+            set_upgrade_memo_size(2)
+            for _ in range(3):
+                self.assertEqual(translit.downgrade(text, "ascii"), expected)
+            translit.downgrade(text + " ", "ascii")
+            self.assertEqual(memo_info(), (2, 1, 2, 1))
+            translit.upgrade(expected, "fr")
+            translit.upgrade(expected, "fr")
+            self.assertEqual(upgrade_memo_info().hits, 1)
+        finally:
+            set_memo_size(0)
+            set_upgrade_memo_size(0)
+        self.assertEqual(memo_info().currsize, 0)
+
+    def test_preload(self):
+        try:
+            purge()
+            translit.preload(["ascii"], blocks=[0], freeze=False)
+            misses = cache_info("ascii").misses
+            self.assertEqual(misses, 0x800 - 0x80)
+            translit.downgrade("“Ærøskøbing”", "ascii")
+            self.assertEqual(cache_info("ascii").misses, misses + 2)
+        finally:
+            purge()
+
+    def test_threads(self):
+        from concurrent.futures import ThreadPoolExecutor
+        texts = ["".join(chr(n) for n in range(start, start + 0x100))
+                 for start in range(0x100, 0x3100, 0x100)]
+        expected = {encoding: [translit.downgrade(text, encoding)
+                               for text in texts]
+                    for encoding in ["ascii", "latin-1"]}
+        try:
+            set_cache_size(0x200)
+            purge()
+            with ThreadPoolExecutor(8) as executor:
+                for encoding, results in expected.items():
+                    self.assertEqual(list(executor.map(
+                        translit.downgrade, texts * 4,
+                        [encoding] * len(texts) * 4)), results * 4)
+            self.assertLessEqual(cache_info().currsize, 0x200)
+        finally:
+            set_cache_size()
+            purge()
+
+    def test_disk_cache(self):
+        text = "“œuvre” – 37.0\u202f℃"
+        expected = translit.downgrade(text, "ascii")
+        cache_dir = tempfile.mkdtemp()
+        try:
+            set_disk_cache(cache_dir)
+            purge()
+            translit.downgrade(text, "ascii")
+            save_disk_cache()
+            purge()
+            self.assertEqual(translit.downgrade(text, "ascii"), expected)
+            self.assertEqual(cache_info("ascii").misses, 0)
+        finally:
+            set_disk_cache(None)
+            shutil.rmtree(cache_dir)
+            purge()
+
+    if translit.iconv_str:
+        def test_iconv_tables(self):
+            from translit.generate_iconv_tables import (get_chars,
+                                                        write_iconv_tables)
+            chars = get_chars(0x80, 0x2200)
+            text = "".join(chars)
+            encodings = ["ascii", "cp1252"]
+            fd, path = tempfile.mkstemp(".zip")
+            os.close(fd)
+            try:
+                with mock.patch.object(downgrade_module, "iconv_tables", {}), \
+                        mock.patch.object(downgrade_module,
+                                          "ICONV_TABLES_PATH", path):
+                    purge()
+                    # Live iconv, as the table file is still empty.
+                    expected = [translit.downgrade(text, encoding)
+                                for encoding in encodings]
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        write_iconv_tables(path, encodings, chars)
+                    downgrade_module.iconv_tables.clear()
+                    purge()
+                    for encoding in encodings:
+                        self.assertTrue(
+                            downgrade_module._get_iconv_table(encoding))
+                    self.assertEqual([translit.downgrade(text, encoding)
+                                      for encoding in encodings], expected)
+            finally:
+                os.remove(path)
+                purge()
+
+    def test_shared_tables(self):
+        text = "“œuvre” – 37.0\u202f℃"
+        translit.downgrade(text, "ascii")
+        # Only the attached table knows this replacement.
+        translit.get_downgrade_table("ascii")[ord("œ")] = "oe!"
+        expected = text.translate(translit.get_downgrade_table("ascii"))
+        tables_dir = tempfile.mkdtemp()
+        try:
+            export_shared_tables(tables_dir)
+            purge()
+            attach_shared_tables(tables_dir)
+            self.assertEqual(translit.downgrade(text, "ascii"), expected)
+            if translate:
+                # Hits are served from the attached table, not copied.
+                self.assertEqual(cache_info("ascii").misses, 0)
+                self.assertEqual(
+                    len(translit.get_downgrade_table("ascii")), 0x80)
+            table = translit.get_downgrade_table("ascii")
+            self.assertEqual(text.translate(table), expected)
+        finally:
+            attach_shared_tables(None)
+            shutil.rmtree(tables_dir)
+            purge()
+
+    if translate:
+        def test_cython(self):
+            text = "".join(chr(n) for n in range(0x3000)) * 2
+            for encoding in ["ascii", "latin-1", "cp1252"]:
+                table = translit.get_downgrade_table(encoding)
+                self.assertEqual(translate(text, table),
+                                 text.translate(table))
+            table = {0xe9: "e", 0xe8: None, 0xea: 0x65, 0xeb: 0x20ac}
+            text = "aéèêë€"
+            self.assertEqual(translate(text, table), text.translate(table))
+            self.assertRaises(TypeError, translate, text, {0xe9: b"e"})
+    else:
+        warnings.warn("Cython version is unavailable")
+
+    if vectorized:
+        def test_vectorized(self):
+            text = "«\u202fÆsir\u202f» “œuvre” – 37.0\u202f℃ 中文 𝔘" * 3
+            for encoding in ["ascii", "latin-1", "cp1252", "shift_jis"]:
+                self.assertEqual(vectorized.downgrade(text, encoding),
+                                 translit.downgrade(text, encoding))
+            self.assertEqual(vectorized.unidecode(text),
+                             translit.unidecode(text))
+    else:
+        warnings.warn("NumPy version is unavailable")
+
+    if pandas and pyarrow:
+        def test_columns(self):
+            from translit.columns import downgrade_series, unidecode_array
+            values = ["“œuvre”", None, "Æsir", "ascii", "“œuvre”"]
+            expected = [translit.downgrade(value or "", "ascii")
+                        for value in values]
+            for dtype in [object, "string"]:
+                series = downgrade_series(pandas.Series(values, dtype=dtype),
+                                          "ascii")
+                self.assertEqual(series.dtype, dtype)
+                self.assertEqual(series.fillna("").tolist(), expected)
+            array = pyarrow.array(values)
+            self.assertEqual(unidecode_array(array).to_pylist(),
+                             [value and translit.unidecode(value)
+                              for value in values])
+    else:
+        warnings.warn("pandas or pyarrow is unavailable")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -18,10 +18,18 @@
 
 from __future__ import print_function
 
-from .downgrade import downgrade, print, iconv, iconv_str
+__version__ = "0.2a2"
+
+from .downgrade import (downgrade, downgrade_many, iter_downgrade,
+                        needs_downgrade, first_unencodable,
+                        get_downgrade_table, print, iconv, iconv_str)
 from .upgrade import upgrade
+from .preload import preload
+from .transliterator import Transliterator
 from .unidecode import unidecode
 from . import codec
 
 
-__all__ = ["downgrade", "upgrade", "print"]
+__all__ = ["downgrade", "downgrade_many", "iter_downgrade",
+           "needs_downgrade", "first_unencodable", "get_downgrade_table",
+           "upgrade", "preload", "Transliterator", "print"]
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+# cython: language_level=3
+
+cimport cython
+from cpython.dict cimport PyDict_GetItem
+from cpython.ref cimport PyObject
+from cpython.unicode cimport PyUnicode_DecodeUTF8
+from libc.errno cimport errno, E2BIG
+from libc.stdlib cimport malloc, free
+from libc.string cimport strerror
+
+from .iconv import ENCODING_MAP
+
+
+SOURCE_CODE_LANGUAGE = "Cython"
+
+cdef extern from "Python.h":
+    cdef Py_ssize_t PyUnicode_GET_LENGTH(object o)
+    cdef int PyUnicode_KIND(object o)
+    cdef void *PyUnicode_DATA(object o)
+    cdef Py_UCS4 PyUnicode_READ(int kind, void *data, Py_ssize_t index) nogil
+    cdef void PyUnicode_WRITE(int kind, void *data, Py_ssize_t index,
+                              Py_UCS4 value) nogil
+    cdef Py_UCS4 PyUnicode_MAX_CHAR_VALUE(object o)
+    cdef object PyUnicode_New(Py_ssize_t size, Py_UCS4 maxchar)
+    cdef Py_ssize_t PyUnicode_CopyCharacters(object to, Py_ssize_t to_start,
+                                             object frm, Py_ssize_t from_start,
+                                             Py_ssize_t how_many) except -1
+
+cdef extern from "iconv.h" nogil:
+    ctypedef void *iconv_t
+    iconv_t iconv_open(const char *tocode, const char *fromcode)
+    size_t iconv(iconv_t cd, char **inbuf, size_t *inbytesleft,
+                 char **outbuf, size_t *outbytesleft)
+    int iconv_close(iconv_t cd)
+
+
+class Error(OSError):
+    pass
+
+
+def translate(str text, table, shared=None) -> str:
+    """Downgrade characters through a downgrade table.
+
+    Same as text.translate(table) for a dict that maps ASCII characters
+    to themselves, like downgrade tables do: ASCII is copied without
+    lookups, and the result is allocated once, at its final size.
+
+    Characters missing from table are looked up in shared, a FlatTable,
+    before table resolves them. Entries found there are decoded for this
+    call only, so that they stay in shared memory.
+    """
+    cdef Py_ssize_t length = PyUnicode_GET_LENGTH(text)
+    cdef int kind = PyUnicode_KIND(text)
+    cdef void *data = PyUnicode_DATA(text)
+    cdef Py_ssize_t i, j, n
+    cdef Py_ssize_t out_length = 0
+    cdef Py_UCS4 ch
+    cdef Py_UCS4 maxchar = 0x7f
+    cdef list repls = []
+    cdef str repl
+    cdef object out
+    cdef int out_kind
+    cdef void *out_data
+    cdef dict shared_repls = {}
+
+    if not isinstance(table, dict):
+        raise TypeError("table must be a dict")
+
+    # Resolve replacements and size the result.
+    for i in range(length):
+        ch = PyUnicode_READ(kind, data, i)
+        if ch < 0x80:
+            out_length += 1
+            continue
+        if shared is None or PyDict_GetItem(table, <long>ch) is not NULL:
+            repl = _lookup(table, ch)
+        else:
+            repl = _lookup_shared(shared, shared_repls, table, ch)
+        repls.append(repl)
+        out_length += PyUnicode_GET_LENGTH(repl)
+        if PyUnicode_MAX_CHAR_VALUE(repl) > maxchar:
+            maxchar = PyUnicode_MAX_CHAR_VALUE(repl)
+
+    if not repls:
+        return text
+
+    out = PyUnicode_New(out_length, maxchar)
+    out_kind = PyUnicode_KIND(out)
+    out_data = PyUnicode_DATA(out)
+    j = 0
+    n = 0
+    for i in range(length):
+        ch = PyUnicode_READ(kind, data, i)
+        if ch < 0x80:
+            PyUnicode_WRITE(out_kind, out_data, j, ch)
+            j += 1
+            continue
+        repl = <str>repls[n]
+        n += 1
+        PyUnicode_CopyCharacters(out, j, repl, 0, PyUnicode_GET_LENGTH(repl))
+        j += PyUnicode_GET_LENGTH(repl)
+    return out
+
+
+cdef inline str _lookup(object table, Py_UCS4 ch):
+    cdef object key = <long>ch
+    cdef PyObject *value = PyDict_GetItem(table, key)
+    cdef object repl
+    if value is NULL:
+        try:
+            # Resolved by DowngradeTable.__missing__().
+            repl = table[key]
+        except LookupError:
+            return chr(ch)
+    else:
+        repl = <object>value
+    if type(repl) is str:
+        return <str>repl
+    # Values that tables filled from elsewhere may hold, as str.translate()
+    # takes them.
+    if repl is None:
+        return ""
+    if isinstance(repl, int):
+        return chr(repl)
+    if isinstance(repl, str):
+        return <str?>repl
+    raise TypeError("character mapping must return integer, None or str")
+
+
+cdef str _lookup_shared(object shared, dict shared_repls, object table,
+                        Py_UCS4 ch):
+    cdef object key = <long>ch
+    cdef PyObject *value = PyDict_GetItem(shared_repls, key)
+    cdef object repl
+    if value is not NULL:
+        return <str>value
+    repl = _get_shared(shared.keys, shared.indexes, shared.offsets,
+                       shared.pool, ch)
+    if repl is None:
+        return _lookup(table, ch)
+    shared_repls[key] = repl
+    return repl
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef object _get_shared(const unsigned int[:] keys,
+                        const unsigned int[:] indexes,
+                        const unsigned int[:] offsets,
+                        const unsigned char[:] pool, Py_UCS4 ch):
+    cdef Py_ssize_t low = 0
+    cdef Py_ssize_t high = keys.shape[0]
+    cdef Py_ssize_t middle
+    cdef unsigned int index, start, end
+    while low < high:
+        middle = (low + high) // 2
+        if keys[middle] < ch:
+            low = middle + 1
+        else:
+            high = middle
+    if low == keys.shape[0] or keys[low] != ch:
+        return None
+    index = indexes[low]
+    start = offsets[index]
+    end = offsets[index + 1]
+    if start == end:
+        return ""
+    return PyUnicode_DecodeUTF8(<const char *>&pool[start], end - start,
+                                "surrogatepass")
+
+
+def iconv_str(str text, to_code="ascii", to_suffix=None) -> bytes:
+    """Perform character set conversion from str to bytes.
+
+    Same as translit.iconv.iconv_str(), calling iconv without ctypes.
+    """
+    cdef bytes in_bytes
+    cdef bytes to_code_bytes
+    cdef iconv_t cd
+
+    to_code = ENCODING_MAP.get(to_code, to_code)
+    if to_suffix:
+        to_code += "//" + to_suffix
+    to_code_bytes = to_code.encode()
+    # Lone surrogates get rejected by iconv, like with wchar_t.
+    in_bytes = text.encode("utf-8", "surrogatepass")
+
+    cd = iconv_open(to_code_bytes, b"UTF-8")
+    if cd == <iconv_t>-1:
+        _raise_error(errno)
+    try:
+        return _convert(cd, in_bytes, len(in_bytes))
+    finally:
+        iconv_close(cd)
+
+
+cdef bytes _convert(iconv_t cd, char *in_buf, size_t in_length):
+    cdef size_t out_capacity = in_length * 4 + 4
+    cdef char *out_buf
+    cdef char *pin
+    cdef char *pout
+    cdef size_t in_left, out_left, n
+    cdef int error
+
+    while True:
+        out_buf = <char *>malloc(out_capacity)
+        if out_buf == NULL:
+            raise MemoryError
+        try:
+            pin = in_buf
+            pout = out_buf
+            in_left = in_length
+            out_left = out_capacity
+            error = 0
+            with nogil:
+                iconv(cd, NULL, NULL, NULL, NULL)
+                n = iconv(cd, &pin, &in_left, &pout, &out_left)
+                if n != <size_t>-1:
+                    # Flush characters some converters hold back.
+                    n = iconv(cd, NULL, NULL, &pout, &out_left)
+                if n == <size_t>-1:
+                    error = errno
+            if error == E2BIG:
+                # Transliterations can take many bytes per character.
+                out_capacity *= 4
+                continue
+            if error:
+                _raise_error(error)
+            return out_buf[:out_capacity - out_left]
+        finally:
+            free(out_buf)
+
+
+cdef int _raise_error(int error) except -1:
+    raise Error(error, strerror(error).decode("utf-8", "replace"))
@@ -0,0 +1,274 @@
+"""Bounded caches of lazily filled translation tables and of whole results
+
+Tables are safe to use from several threads, without relying on the GIL.
+"""
+import threading
+from collections import deque, namedtuple, OrderedDict
+
+try:
+    from functools import lru_cache
+except ImportError:
+    from .backports.functools import lru_cache
+
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+LOCK_STRIPES = 16
+DEFAULT_MEMO_MAX_LENGTH = 0x100
+
+
+class LazyTable(dict):
+    """Translation table whose entries are resolved on first lookup
+
+    Subclasses implement resolve(). Lookups made by str.translate() don't
+    run any Python code on hits, so only misses are counted here; callers
+    report the number of characters they translate with add_lookups().
+
+    Concurrent misses on the same code point resolve it once, the other
+    threads waiting for the result. Misses on code points that map to
+    different lock stripes are resolved in parallel.
+    """
+    def __init__(self, key, cache=None):
+        super().__init__()
+        self.key = key
+        self.cache = cache
+        self.resolved = deque()
+        self.lookups = 0
+        self.misses = 0
+        self.unsaved = 0
+        self.lock = threading.Lock()
+        self.stripe_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+    def resolve(self, code_point):
+        raise NotImplementedError
+
+    def __missing__(self, code_point):
+        with self.stripe_locks[code_point % LOCK_STRIPES]:
+            # Another thread may have resolved it while this one waited.
+            value = dict.get(self, code_point)
+            if value is not None:
+                return value
+            value = self.resolve(code_point)
+            with self.lock:
+                self[code_point] = value
+                self.resolved.append(code_point)
+                self.misses += 1
+                self.unsaved += 1
+        # No table lock is held, as the cache may lock other tables.
+        cache = self.cache
+        if cache is not None:
+            cache.added(self)
+        return value
+
+    def add_lookups(self, count):
+        """Count lookups made without a miss, for hit statistics.
+        """
+        with self.lock:
+            self.lookups += count
+
+    def preload(self, entries):
+        """Add entries resolved beforehand.
+        """
+        count = 0
+        with self.lock:
+            for code_point, value in entries.items():
+                if code_point not in self:
+                    self[code_point] = value
+                    self.resolved.append(code_point)
+                    count += 1
+        cache = self.cache
+        if count and cache is not None:
+            cache.added(self, count)
+        return count
+
+    def evict(self, count):
+        """Drop up to count of the oldest resolved entries.
+        """
+        with self.lock:
+            count = min(count, len(self.resolved))
+            for _ in range(count):
+                del self[self.resolved.popleft()]
+        return count
+
+    def get_resolved(self) -> dict:
+        """Get a copy of the resolved entries.
+        """
+        with self.lock:
+            return {code_point: self[code_point]
+                    for code_point in self.resolved}
+
+
+class TableCache(object):
+    """Cache of lazily filled tables holding at most max_size entries
+
+    When full, the oldest entries of the least recently used tables
+    are evicted first. If a store is given, new tables are preloaded
+    from it and save() writes resolved entries back.
+
+    Getting the most recently used table again takes no lock, so that
+    threads working with one table don't contend. Hits are only reported
+    when count_lookups is set, as counting them is up to callers.
+    """
+    def __init__(self, table_factory, max_size=None, store=None):
+        self.table_factory = table_factory
+        self.max_size = max_size
+        self.store = store
+        self.count_lookups = False
+        self.tables = OrderedDict()
+        self.size = 0
+        self.last_key = None
+        self.lock = threading.RLock()
+
+    def __getitem__(self, key):
+        table = self.tables.get(key)
+        if table is not None and key == self.last_key:
+            return table
+        with self.lock:
+            table = self.tables.get(key)
+            if table is None:
+                table = self.tables[key] = self.table_factory(key, self)
+                if self.store is not None:
+                    table.preload(self.store.load(key))
+            else:
+                self.tables.move_to_end(key)
+            self.last_key = key
+            return table
+
+    def __contains__(self, key):
+        return key in self.tables
+
+    def __len__(self):
+        return len(self.tables)
+
+    def added(self, table, count=1):
+        with self.lock:
+            if self.tables.get(table.key) is not table:
+                # Popped in the meantime.
+                return
+            self.size += count
+            if self.max_size is not None and self.size > self.max_size:
+                # Evict in batches to keep the cost per miss low.
+                self.evict(self.size - self.max_size + self.max_size // 8)
+
+    def evict(self, count):
+        with self.lock:
+            for table in list(self.tables.values()):
+                if count <= 0:
+                    break
+                evicted = table.evict(count)
+                self.size -= evicted
+                count -= evicted
+
+    def set_count_lookups(self, enabled):
+        """Turn counting lookups on or off.
+
+        Tables count their misses so far as lookups, so that hits are
+        only those made while counting.
+        """
+        with self.lock:
+            self.count_lookups = enabled
+            for table in self.tables.values():
+                with table.lock:
+                    table.lookups = table.misses
+
+    def resize(self, max_size):
+        with self.lock:
+            self.max_size = max_size
+            if max_size is not None and self.size > max_size:
+                self.evict(self.size - max_size)
+
+    def pop(self, key):
+        with self.lock:
+            table = self.tables.pop(key, None)
+            if table is not None:
+                table.cache = None
+                self.size -= len(table.resolved)
+            if key == self.last_key:
+                self.last_key = None
+            return table
+
+    def clear(self):
+        with self.lock:
+            for table in self.tables.values():
+                table.cache = None
+            self.tables.clear()
+            self.size = 0
+            self.last_key = None
+
+    def items(self):
+        """Get a snapshot of the tables and their keys.
+        """
+        with self.lock:
+            return list(self.tables.items())
+
+    def save(self):
+        """Write entries resolved since the last save to the store.
+        """
+        if self.store is None:
+            return
+        for key, table in self.items():
+            if table.unsaved:
+                self.store.save(key, table.get_resolved())
+                table.unsaved = 0
+
+    def info(self, key=None):
+        """Report cache statistics, for one table or for all of them.
+        """
+        with self.lock:
+            if key is None:
+                tables = list(self.tables.values())
+            else:
+                tables = [self.tables[key]] if key in self.tables else []
+        misses = sum(table.misses for table in tables)
+        size = sum(len(table.resolved) for table in tables)
+        if self.count_lookups:
+            lookups = sum(table.lookups for table in tables)
+            hits = max(lookups - misses, 0)
+        else:
+            hits = None
+        return CacheInfo(hits, misses, self.max_size, size)
+
+
+class Memo(object):
+    """Opt-in LRU cache of whole results of a function of text
+
+    Only text up to max_length is cached. Nothing is until resize()
+    is called.
+    """
+    def __init__(self, func):
+        self.func = func
+        self.cached_func = None
+        self.max_length = DEFAULT_MEMO_MAX_LENGTH
+
+    def get_func(self, text):
+        """Get the cached function if results for text are cached, else None.
+
+        Call the result rather than the memo again, as resize() may turn
+        caching off in the meantime.
+        """
+        cached_func = self.cached_func
+        if cached_func is not None and len(text) <= self.max_length:
+            return cached_func
+        return None
+
+    def resize(self, max_size, max_length=DEFAULT_MEMO_MAX_LENGTH):
+        """Keep up to max_size results, None lifting the limit.
+
+        0 turns caching off.
+        """
+        if max_size == 0:
+            self.cached_func = None
+        else:
+            self.cached_func = lru_cache(max_size)(self.func)
+        self.max_length = max_length
+
+    def clear(self):
+        cached_func = self.cached_func
+        if cached_func is not None:
+            cached_func.cache_clear()
+
+    def info(self):
+        cached_func = self.cached_func
+        if cached_func is None:
+            return CacheInfo(0, 0, 0, 0)
+        return cached_func.cache_info()
@@ -1,16 +1,34 @@
 import codecs
+import re
 
-from .downgrade import encode_factory
-from .upgrade import decode_factory
+from .downgrade import (encode_factory, incremental_encoder_factory,
+                        stream_writer_factory, translit_errors)
+from .upgrade import (decode_factory, incremental_decoder_factory,
+                      stream_reader_factory)
+
+
+# Since Python 3.9, codecs.lookup() normalizes "latin-1/translit/fr"
+# to "latin_1_translit_fr" before calling search functions.
+TRANSLIT_RE = re.compile(r"^(.+?)[/_]translit(?:[/_](.+))?$")
 
 
 def search_function(encoding):
-    parts = encoding.split("/")
-    if len(parts) > 1 and parts[1] == "translit":
-        e = parts[0]
+    match = TRANSLIT_RE.match(encoding)
+    if match:
+        e, language = match.groups()
+        if language:
+            language, sep, territory = language.partition("_")
+            language += sep + territory.upper()
         encode_func = encode_factory(e)
-        decode_func = decode_factory(e, parts[2] if len(parts) > 2 else None)
-        return codecs.CodecInfo(encode_func, decode_func)
+        decode_func = decode_factory(e, language)
+        return codecs.CodecInfo(
+            encode_func, decode_func,
+            incrementalencoder=incremental_encoder_factory(e),
+            incrementaldecoder=incremental_decoder_factory(e, language),
+            streamwriter=stream_writer_factory(e),
+            streamreader=stream_reader_factory(e, language),
+            name=encoding)
 
 
 codecs.register(search_function)
+codecs.register_error("translit", translit_errors)
@@ -0,0 +1,74 @@
+"""Transliteration of pandas and Arrow string columns
+
+Columns are factorized, so that each distinct value is transliterated once
+and results are scattered back by index. pandas and pyarrow are only
+imported when used.
+"""
+from .downgrade import DEFAULT_ENCODING, downgrade_many
+from .unidecode import unidecode
+
+
+def downgrade_series(series, encoding=DEFAULT_ENCODING):
+    """Downgrade a pandas Series of strings to fit into the specified encoding.
+
+    Missing values stay missing.
+    """
+    return _map_series(series, lambda values: downgrade_many(values, encoding))
+
+
+def unidecode_series(series):
+    """Transliterate a pandas Series of strings into ASCII.
+
+    Missing values stay missing.
+    """
+    return _map_series(series, _unidecode_many)
+
+
+def downgrade_array(array, encoding=DEFAULT_ENCODING):
+    """Downgrade an Arrow string array to fit into the specified encoding.
+
+    Values are only converted to Python strings once per distinct value.
+    Nulls stay null.
+    """
+    return _map_array(array, lambda values: downgrade_many(values, encoding))
+
+
+def unidecode_array(array):
+    """Transliterate an Arrow string array into ASCII.
+
+    Values are only converted to Python strings once per distinct value.
+    Nulls stay null.
+    """
+    return _map_array(array, _unidecode_many)
+
+
+def _unidecode_many(values):
+    return [unidecode(value) for value in values]
+
+
+def _map_series(series, func):
+    import pandas
+
+    codes, uniques = pandas.factorize(series)
+    dtype = result_dtype = series.dtype
+    if isinstance(dtype, pandas.CategoricalDtype):
+        # Transliterated values may no longer be categories, or be the same.
+        dtype, result_dtype = dtype.categories.dtype, "category"
+    results = pandas.array(func(list(uniques)), dtype=dtype)
+    return pandas.Series(results.take(codes, allow_fill=True),
+                         index=series.index, name=series.name,
+                         dtype=result_dtype)
+
+
+def _map_array(array, func):
+    import pyarrow
+    import pyarrow.compute
+
+    if isinstance(array, pyarrow.ChunkedArray):
+        return pyarrow.chunked_array(
+            [_map_array(chunk, func) for chunk in array.chunks], array.type)
+    if pyarrow.compute.all(pyarrow.compute.string_is_ascii(array)).as_py():
+        return array
+    encoded = array.dictionary_encode()
+    dictionary = func(encoded.dictionary.to_pylist())
+    return pyarrow.array(dictionary, array.type).take(encoded.indices)
@@ -0,0 +1,82 @@
+"""On-disk store for resolved translation table entries
+"""
+import hashlib
+import json
+import os
+import platform
+import sys
+import tempfile
+
+from . import __version__
+from . import unidecode
+from .unidecode.tablefile import TABLE_PATH
+
+
+CACHE_DIR_ENV = "TRANSLIT_CACHE_DIR"
+
+
+def get_default_cache_dir():
+    """Get the per-user cache directory for translit.
+    """
+    if os.name == "nt":
+        base_dir = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    else:
+        base_dir = (os.environ.get("XDG_CACHE_HOME") or
+                    os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(base_dir, "translit")
+
+
+def get_identity(*parts) -> str:
+    """Hash everything resolved entries depend on.
+
+    That is the translit version, the Python version, the C library
+    and the unidecode table, along with the given parts.
+    """
+    h = hashlib.sha1()
+    for part in (__version__, sys.version_info[:2], platform.libc_ver(),
+                 unidecode.SOURCE_CODE_LANGUAGE) + parts:
+        h.update(repr(part).encode("utf-8"))
+    with open(TABLE_PATH, "rb") as f:
+        h.update(f.read())
+    return h.hexdigest()[:16]
+
+
+class DiskStore(object):
+    """Store of table entries, with one JSON file per table
+
+    Files live in a subdirectory named after the identity, so entries
+    resolved by another setup are never picked up.
+    """
+    def __init__(self, path, identity):
+        self.path = os.path.join(path, identity)
+
+    def load(self, key) -> dict:
+        try:
+            with open(self._get_file_path(key), encoding="utf-8") as f:
+                entries = json.load(f)
+        except (EnvironmentError, ValueError):
+            return {}
+        return {int(code_point): value
+                for code_point, value in entries.items()}
+
+    def save(self, key, entries):
+        """Merge entries into the stored ones.
+        """
+        merged = self.load(key)
+        merged.update(entries)
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        fd, temp_path = tempfile.mkstemp(".tmp", dir=self.path)
+        try:
+            with open(fd, "w", encoding="utf-8") as f:
+                json.dump({str(code_point): value
+                           for code_point, value in merged.items()}, f,
+                          ensure_ascii=False, sort_keys=True)
+            # Atomic, so that concurrent workers never read partial files.
+            os.replace(temp_path, self._get_file_path(key))
+        except:
+            os.remove(temp_path)
+            raise
+
+    def _get_file_path(self, key):
+        return os.path.join(self.path, key + ".json")
@@ -1,36 +1,84 @@
 from __future__ import print_function
 
+import atexit
 import builtins
 import codecs
+import json
 import os
 import re
 import sys
+import threading
 import warnings
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 
+from . import diskcache, flattable
+from .cache import DEFAULT_MEMO_MAX_LENGTH, LazyTable, Memo, TableCache
 from .unidecode import unidecode
 
 
 DEFAULT_ENCODING = "latin-1"
+DEFAULT_CACHE_SIZE = 0x10000
+# Smaller chunks cost more to send to workers than to downgrade.
+PARALLEL_CHUNK_SIZE = 0x100000
+DEFAULT_BATCH_CHUNK_SIZE = 0x400
+ENCODABLE_BLOCK_SIZE = 0x1000
+SHARED_TABLE_EXT = ".table"
 
 ICONV_OS_BLACKLIST = {
     "nt",
 }
 
 if os.name in ICONV_OS_BLACKLIST:
-    iconv = iconv_str = None
+    iconv = iconv_str = IConvError = get_iconv_identity = None
 else:
     try:
-        from .iconv import iconv, iconv_str, Error as IConvError
+        from .iconv import (iconv, iconv_str, Error as IConvError,
+                            get_identity as get_iconv_identity)
     except (ImportError, OSError) as e:
-        iconv = iconv_str = None
+        iconv = iconv_str = IConvError = get_iconv_identity = None
         warnings.warn("iconv is unavaiable: {}".format(e), ImportWarning)
+    else:
+        try:
+            # Calls iconv directly instead of through ctypes.
+            from ._downgrade import iconv_str, Error as IConvError
+        except ImportError:
+            pass
+
+try:
+    from ._downgrade import translate as _translate
+except (ImportError, OSError):
+    def _translate(text, table, shared_table=None):
+        # Shared entries get copied into table by DowngradeTable.resolve().
+        return text.translate(table)
+
+ICONV_TABLES_PATH = os.path.join(os.path.dirname(__file__),
+                                 "iconv_tables.zip")
 
 
+# Matches start with a character of their rule, which tells what to
+# replace them with. There are no groups, so that patterns can be combined
+# into one, which then only stops at these characters.
 RE_SUBS = {
-    ("«»", re.compile(r"«\s?|\s?»", re.U), r'"'),
-    ("Æ", re.compile(r"Æ([a-zß-öø-ÿœ])"), r"Ae\1"),
-    ("Þ", re.compile(r"Þ([a-zß-öø-ÿœ])"), r"Th\1"),
-    ("Œ", re.compile(r"Œ([a-zß-öø-ÿœ])"), r"Oe\1"),
+    ("«»", re.compile(r"«\s?|»", re.U), r'"'),
+    ("Æ", re.compile(r"Æ(?=[a-zß-öø-ÿœ])"), r"Ae"),
+    ("Þ", re.compile(r"Þ(?=[a-zß-öø-ÿœ])"), r"Th"),
+    ("Œ", re.compile(r"Œ(?=[a-zß-öø-ÿœ])"), r"Oe"),
+}
+
+RE_SUB_REPLS = {c: repl for chars, pattern, repl in RE_SUBS for c in chars}
+
+# Characters that also replace a whitespace character before them.
+RE_SUB_LEADING_SPACE = {"»"}
+
+# Trailing text that RE_SUBS patterns need to see past,
+# keyed like RE_SUBS by the characters that trigger them.
+RE_SUB_TAILS = {
+    "«»": r"«\s?|\s",
+    "Æ": r"Æ",
+    "Þ": r"Þ",
+    "Œ": r"Œ",
 }
 
 UNICODE_SUBS = {
@@ -40,78 +88,530 @@ UNICODE_SUBS = {
     "№": "Nº",
 }
 
+NON_ASCII_RE = re.compile(r"[^\x00-\x7f]")
+
 needs_substitution_cache = {}
-downgrade_cache = {}
+substitution_res = {}
+tail_res = {}
+unencodable_res = {}
+encodable_ranges = {}
+iconv_tables = {}
+shared_tables = {}
+charmap_encodings = {}
+# Held while building per-encoding data that is slow to build,
+# so that threads missing it at once build it once.
+build_lock = threading.RLock()
+executor = None
+executor_workers = 0
+
+try:
+    _isascii = str.isascii
+except AttributeError:
+    _isascii = lambda text: not NON_ASCII_RE.search(text)
+
+
+class DowngradeTable(LazyTable):
+    """Translation table from code points to downgraded replacements
+
+    Entries are resolved lazily, so the table can be passed as is
+    to str.translate().
+    """
+    def __init__(self, encoding, cache=None):
+        super().__init__(encoding, cache)
+        self.update((n, chr(n)) for n in range(0x80))
+        self.encoding = encoding
+
+    def resolve(self, code_point):
+        shared_table = shared_tables.get(self.encoding)
+        if shared_table is not None:
+            repl = shared_table.get(code_point)
+            if repl is not None:
+                return repl
+        return _downgrade_char(chr(code_point), self.encoding)
 
 
-def downgrade(text: str, encoding=DEFAULT_ENCODING) -> str:
+downgrade_tables = TableCache(DowngradeTable, DEFAULT_CACHE_SIZE)
+
+
+def downgrade(text: str, encoding=DEFAULT_ENCODING, workers=None) -> str:
     """Downgrade text to fit into the specified encoding.
+
+    Text that already fits is returned as is. ASCII text is returned
+    before the encoding is even looked up, so an unknown encoding only
+    raises LookupError for other text. With workers, large text is split
+    into chunks downgraded by that many processes.
     """
+    if _isascii(text):
+        return text
+    cached_func = memo.get_func(text)
+    if cached_func is not None:
+        return cached_func(text, encoding)
     encoding = codecs.lookup(encoding).name
-    for chars, pattern, repl in RE_SUBS:
-        try:
-            needs_substitution = needs_substitution_cache[chars[0], encoding]
-        except KeyError:
-            try:
-                chars[0].encode(encoding)
-            except UnicodeEncodeError:
-                needs_substitution = True
-            else:
-                needs_substitution = False
-            needs_substitution_cache[chars[0], encoding] = needs_substitution
-        if needs_substitution and any(c in text for c in chars):
-            text = pattern.sub(repl, text)
+    if workers and workers > 1 and len(text) > PARALLEL_CHUNK_SIZE:
+        chunks = _split_chunks(text, encoding, workers)
+        return "".join(_get_executor(workers).map(_downgrade, chunks,
+                                                  repeat(encoding)))
     return _downgrade(text, encoding)
 
 
+def _lookup_and_downgrade(text, encoding):
+    return _downgrade(text, codecs.lookup(encoding).name)
+
+
+memo = Memo(_lookup_and_downgrade)
+
+
+def iter_downgrade(chunks, encoding=DEFAULT_ENCODING):
+    """Downgrade text chunks to fit into the specified encoding.
+
+    Joined together, the yielded chunks are the same as downgrading
+    the joined input.
+    """
+    encoding = codecs.lookup(encoding).name
+    tail = ""
+    for chunk in chunks:
+        text, tail = _split_tail(tail + chunk, encoding)
+        if text:
+            yield _downgrade(text, encoding)
+    if tail:
+        yield _downgrade(tail, encoding)
+
+
+def downgrade_many(texts, encoding=DEFAULT_ENCODING, workers=None,
+                   chunksize=DEFAULT_BATCH_CHUNK_SIZE) -> list:
+    """Downgrade many texts to fit into the specified encoding.
+
+    Each distinct text is downgraded once. With workers, they are sent
+    by chunks of chunksize to that many processes. Results are in the
+    same order as texts.
+    """
+    encoding = codecs.lookup(encoding).name
+    texts = list(texts)
+    results = {}
+    pending = []
+    for text in dict.fromkeys(texts):
+        if _isascii(text):
+            results[text] = text
+        else:
+            pending.append(text)
+    if workers and workers > 1 and len(pending) > chunksize:
+        downgraded = _get_executor(workers).map(
+            _downgrade, pending, repeat(encoding), chunksize=chunksize)
+    else:
+        downgraded = (_downgrade(text, encoding) for text in pending)
+    results.update(zip(pending, downgraded))
+    return [results[text] for text in texts]
+
+
 def _downgrade(text, encoding):
-    result = []
-    for c in text:
-        if c < "\x80":
-            result.append(c)
-            continue
+    if _is_encodable(text, encoding):
+        return text
+    text = _substitute(text, encoding)
+    table = downgrade_tables[encoding]
+    # ASCII is translated without looking it up.
+    if downgrade_tables.count_lookups:
+        table.add_lookups(len(text) - len(text.encode("ascii", "ignore")))
+    return _translate(text, table, shared_tables.get(encoding))
+
+
+def _substitute(text, encoding):
+    """Apply the RE_SUBS substitutions an encoding needs.
+
+    Patterns of rules are combined into one, so the text is scanned once
+    whatever the number of rules.
+    """
+    try:
+        substitution_re = substitution_res[encoding]
+    except KeyError:
+        patterns = [pattern.pattern for chars, pattern, repl in sorted(RE_SUBS)
+                    if _needs_substitution(chars, encoding)]
+        if patterns:
+            substitution_re = re.compile("|".join(patterns))
+        else:
+            substitution_re = None
+        substitution_res[encoding] = substitution_re
+    if substitution_re is None:
+        return text
+    pieces = []
+    end = 0
+    for match in substitution_re.finditer(text):
+        start = match.start()
+        c = text[start]
+        if (c in RE_SUB_LEADING_SPACE and start > end and
+                text[start - 1].isspace()):
+            start -= 1
+        pieces.append(text[end:start])
+        pieces.append(RE_SUB_REPLS[c])
+        end = match.end()
+    if not pieces:
+        return text
+    pieces.append(text[end:])
+    return "".join(pieces)
+
+
+def _needs_substitution(chars, encoding):
+    try:
+        return needs_substitution_cache[chars[0], encoding]
+    except KeyError:
+        pass
+    try:
+        chars[0].encode(encoding)
+    except UnicodeEncodeError:
+        needs_substitution = True
+    else:
+        needs_substitution = False
+    needs_substitution_cache[chars[0], encoding] = needs_substitution
+    return needs_substitution
+
+
+def _split_tail(text, encoding):
+    """Split off the shortest tail that depends on text yet to come.
+
+    Downgrading both parts separately gives the same result as downgrading
+    the whole text, whatever gets appended to the tail.
+    """
+    try:
+        tail_re = tail_res[encoding]
+    except KeyError:
+        tails = [RE_SUB_TAILS[chars] for chars, pattern, repl in RE_SUBS
+                 if _needs_substitution(chars, encoding)]
+        if tails:
+            tail_re = re.compile(r"(?:{})\Z".format("|".join(tails)))
+        else:
+            tail_re = None
+        tail_res[encoding] = tail_re
+    if tail_re:
+        match = tail_re.search(text, max(len(text) - 2, 0))
+        if match:
+            return text[:match.start()], text[match.start():]
+    return text, ""
+
+
+def _split_chunks(text, encoding, count):
+    """Split text into about count chunks that downgrade independently.
+    """
+    size = max(-(-len(text) // count), PARALLEL_CHUNK_SIZE)
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = start + size
+        if end < len(text):
+            head, tail = _split_tail(text[end - 2:end], encoding)
+            end -= len(tail)
+        chunks.append(text[start:end])
+        start = end
+    return chunks
+
+
+def _get_executor(workers):
+    """Get a process pool with that many workers, reusing the last one.
+
+    Workers start with the entries resolved so far in downgrade tables.
+    """
+    global executor, executor_workers
+    with build_lock:
+        if executor_workers != workers:
+            if executor is not None:
+                executor.shutdown(wait=False)
+            entries = {encoding: table.get_resolved()
+                       for encoding, table in downgrade_tables.items()}
+            executor = ProcessPoolExecutor(workers, initializer=_init_worker,
+                                           initargs=(entries,))
+            executor_workers = workers
+        return executor
+
+
+def _init_worker(entries):
+    for encoding, table_entries in entries.items():
+        downgrade_tables[encoding].preload(table_entries)
+
+
+def get_downgrade_table(encoding=DEFAULT_ENCODING) -> DowngradeTable:
+    """Get the translation table that downgrades characters to an encoding.
+
+    Contextual substitutions made by downgrade() are not part of the table.
+    """
+    return downgrade_tables[codecs.lookup(encoding).name]
+
+
+def needs_downgrade(text: str, encoding=DEFAULT_ENCODING) -> bool:
+    """Tell whether text has characters the specified encoding can't encode.
+    """
+    return not _is_encodable(text, codecs.lookup(encoding).name)
+
+
+def first_unencodable(text: str, encoding=DEFAULT_ENCODING) -> int:
+    """Find the first character the specified encoding can't encode.
+
+    Return its index, or -1 if there is none. Like with downgrade(),
+    the encoding is not looked up for ASCII text.
+    """
+    if _isascii(text):
+        return -1
+    match = _get_unencodable_re(codecs.lookup(encoding).name).search(text)
+    return match.start() if match else -1
+
+
+def _is_encodable(text, encoding):
+    if _isascii(text):
+        return True
+    if encoding == "iso8859-1":
+        return max(text) <= "\xff"
+    return not _get_unencodable_re(encoding).search(text)
+
+
+def _get_unencodable_re(encoding):
+    try:
+        return unencodable_res[encoding]
+    except KeyError:
+        pass
+    with build_lock:
+        try:
+            return unencodable_res[encoding]
+        except KeyError:
+            pass
+        unencodable_re = unencodable_res[encoding] = re.compile(
+            "[^{}]".format("".join(
+                r"\U{:08x}-\U{:08x}".format(start, end - 1)
+                for start, end in _get_encodable_ranges(encoding))))
+        return unencodable_re
+
+
+def _get_encodable_ranges(encoding):
+    """Get the ranges of code points an encoding can encode.
+
+    Ranges are (start, end) pairs, end being excluded.
+    """
+    try:
+        return encodable_ranges[encoding]
+    except KeyError:
+        pass
+    with build_lock:
         try:
-            repl = downgrade_cache[c, encoding]
+            return encodable_ranges[encoding]
         except KeyError:
+            pass
+        module = sys.modules.get(
+            getattr(codecs.lookup(encoding).encode, "__module__", None))
+        decoding_table = getattr(module, "decoding_table", None)
+        if decoding_table:
+            # Charmap codecs encode what they decode to.
+            ranges = []
+            for code_point in sorted(set(map(ord, decoding_table)) -
+                                     {0xfffe}):
+                _add_range(ranges, code_point, code_point + 1)
+        else:
+            ranges = _find_encodable_ranges(encoding)
+        encodable_ranges[encoding] = ranges
+        return ranges
+
+
+def _find_encodable_ranges(encoding):
+    """Find encodable ranges by trial encoding the whole code space.
+
+    Each run of encodable characters takes one encode() up to the first
+    failure, and each run of unencodable ones a binary search.
+    """
+    ranges = [(0, 0x80)]
+    for start in range(0x80, sys.maxunicode + 1, ENCODABLE_BLOCK_SIZE):
+        block = "".join(map(chr, range(
+            start, min(start + ENCODABLE_BLOCK_SIZE, sys.maxunicode + 1))))
+        index = 0
+        while index < len(block):
             try:
-                c.encode(encoding)
-            except UnicodeEncodeError:
-                repl = None
-                if iconv_str:
-                    nc = UNICODE_SUBS.get(c, c)
-                    # Try iconv before using unidecode.
-                    try:
-                        # TODO: Investigate why iconv from Python 2
-                        # behaves differently from Python 3 with \u202f.
-                        b = iconv_str(nc, encoding, "translit")
-                    except IConvError:
-                        pass
-                    else:
-                        if not b"?" in b:
-                            repl = b.decode(encoding)
-                elif c in UNICODE_SUBS:
-                    nc = UNICODE_SUBS[c]
-                    try:
-                        nc.encode(encoding)
-                    except UnicodeEncodeError:
-                        pass
-                    else:
-                        repl = nc
-                if repl is None:
-                    repl = unidecode(c)
+                block[index:].encode(encoding)
+            except UnicodeEncodeError as e:
+                end = index + e.start
             else:
-                repl = c
-            downgrade_cache[c, encoding] = repl
-        result.append(repl)
-    return "".join(result)
+                end = len(block)
+            _add_range(ranges, start + index, start + end)
+            index = end + _count_unencodable(block[end:], encoding)
+    return ranges
+
+
+def _count_unencodable(text, encoding):
+    """Count the unencodable characters text starts with.
+    """
+    if not text:
+        return 0
+    # The ignore error handler doesn't call back into Python.
+    empty = "".encode(encoding)
+    count = 1
+    while (count < len(text) and
+           text[count:2 * count].encode(encoding, "ignore") == empty):
+        count *= 2
+    count = min(count, len(text))
+    end = min(2 * count, len(text))
+    while count < end:
+        middle = (count + end + 1) // 2
+        if text[count:middle].encode(encoding, "ignore") == empty:
+            count = middle
+        else:
+            end = middle - 1
+    return count
+
+
+def _add_range(ranges, start, end):
+    if start == end:
+        return
+    if ranges and ranges[-1][1] == start:
+        ranges[-1] = ranges[-1][0], end
+    else:
+        ranges.append((start, end))
+
+
+def _downgrade_char(c, encoding):
+    if _is_encodable(c, encoding):
+        return c
+    if iconv_str:
+        iconv_table = _get_iconv_table(encoding)
+        if iconv_table is not None:
+            # Precomputed by generate_iconv_tables.py for this host.
+            repl = iconv_table.get(ord(c))
+            if repl is not None:
+                return repl
+            return unidecode(c)
+        nc = UNICODE_SUBS.get(c, c)
+        # Try iconv before using unidecode.
+        try:
+            # TODO: Investigate why iconv from Python 2
+            # behaves differently from Python 3 with \u202f.
+            b = iconv_str(nc, encoding, "translit")
+        except IConvError:
+            pass
+        else:
+            if not b"?" in b:
+                try:
+                    return b.decode(encoding)
+                except UnicodeDecodeError:
+                    pass
+    elif c in UNICODE_SUBS:
+        nc = UNICODE_SUBS[c]
+        try:
+            nc.encode(encoding)
+        except UnicodeEncodeError:
+            pass
+        else:
+            return nc
+    return unidecode(c)
+
+
+def _get_iconv_table(encoding):
+    try:
+        return iconv_tables[encoding]
+    except KeyError:
+        pass
+    with build_lock:
+        try:
+            return iconv_tables[encoding]
+        except KeyError:
+            table = iconv_tables[encoding] = _load_iconv_table(encoding)
+            return table
+
+
+def _load_iconv_table(encoding):
+    """Load iconv transliterations precomputed for this host, if any.
+    """
+    try:
+        with zipfile.ZipFile(ICONV_TABLES_PATH) as f:
+            if f.read("identity").decode("utf-8") != get_iconv_identity():
+                return None
+            table = json.loads(f.read(encoding + ".json").decode("utf-8"))
+    except (EnvironmentError, KeyError, ValueError, zipfile.BadZipfile):
+        return None
+    return {int(code_point): repl for code_point, repl in table.items()}
+
+
+def translit_errors(exc: UnicodeError) -> tuple:
+    """Error handler that downgrades characters an encoding can't handle.
+
+    Only the failing characters are looked at, so contextual substitutions
+    made by downgrade() are not applied.
+
+    Charmap codecs, such as cp1252 or cp437, report "charmap" as their
+    encoding, so the codec is found from the module of the calling frame.
+    This only works when the encode() of the codec module is the direct
+    caller of the handler. Called from another handler, or for
+    codecs.charmap_encode() used directly, it falls back to ASCII.
+    """
+    if not isinstance(exc, UnicodeEncodeError):
+        raise exc
+    if exc.encoding == "charmap":
+        encoding = _get_charmap_encoding(sys._getframe(1))
+    else:
+        encoding = codecs.lookup(exc.encoding).name
+    table = downgrade_tables[encoding]
+    if downgrade_tables.count_lookups:
+        table.add_lookups(exc.end - exc.start)
+    return exc.object[exc.start:exc.end].translate(table), exc.end
+
+
+def _get_charmap_encoding(frame):
+    """Tell which charmap codec is encoding, from the frame calling it.
+
+    Charmap codecs all report "charmap" as their encoding, but encode
+    from Python code of their own module. That has to be the direct
+    caller of the error handler, or ASCII is assumed.
+    """
+    module_name = frame.f_globals.get("__name__")
+    try:
+        return charmap_encodings[module_name]
+    except KeyError:
+        pass
+    try:
+        encoding = codecs.lookup(
+            sys.modules[module_name].getregentry().name).name
+    except (AttributeError, KeyError, LookupError):
+        encoding = "ascii"
+    charmap_encodings[module_name] = encoding
+    return encoding
 
 
 def encode_factory(encoding):
+    encoding = codecs.lookup(encoding).name
+
     def func(input, errors="strict"): #@ReservedAssignment
-        return downgrade(input, encoding).encode(encoding, errors), len(input)
+        return _downgrade(input, encoding).encode(encoding, errors), len(input)
     return func
 
 
+class IncrementalEncoder(codecs.IncrementalEncoder):
+    """Incremental encoder that downgrades text to fit into its encoding
+
+    Nothing is held back between calls, as io.TextIOWrapper never flushes
+    its encoder with final set. Use iter_downgrade() to apply contextual
+    substitutions across chunks.
+    """
+    encoding = DEFAULT_ENCODING
+
+    def encode(self, input, final=False): #@ReservedAssignment
+        return _downgrade(input, self.encoding).encode(self.encoding,
+                                                       self.errors)
+
+
+class StreamWriter(codecs.StreamWriter):
+    """Stream writer that downgrades text to fit into its encoding
+
+    Nothing is held back between writes either, as codecs.open() closes
+    the file without its writer. writelines() downgrades its lines joined.
+    """
+    encoding = DEFAULT_ENCODING
+
+    def encode(self, input, errors="strict"): #@ReservedAssignment
+        return (_downgrade(input, self.encoding).encode(self.encoding, errors),
+                len(input))
+
+
+def incremental_encoder_factory(encoding):
+    return type("IncrementalEncoder", (IncrementalEncoder,),
+                {"encoding": codecs.lookup(encoding).name})
+
+
+def stream_writer_factory(encoding):
+    return type("StreamWriter", (StreamWriter,),
+                {"encoding": codecs.lookup(encoding).name})
+
+
 def print(*args, sep=" ", end="\n", file=sys.stdout): #@ReservedAssignment
     """A print function that performs transliteration.
     """
@@ -122,6 +622,145 @@ def print(*args, sep=" ", end="\n", file=sys.stdout): #@ReservedAssignment
     builtins.print(*args, sep=sep, end=end, file=file)
 
 
-def purge():
-    needs_substitution_cache.clear()
-    downgrade_cache.clear()
+def cache_info(encoding=None):
+    """Report downgrade table statistics, for one encoding or for all.
+
+    Hits are estimated from the number of non-ASCII characters translated,
+    and are None unless set_hit_counting() turned counting them on.
+    """
+    if encoding is not None:
+        encoding = codecs.lookup(encoding).name
+    return downgrade_tables.info(encoding)
+
+
+def set_cache_size(max_size=DEFAULT_CACHE_SIZE):
+    """Limit the number of characters kept in downgrade tables.
+
+    None lifts the limit.
+    """
+    downgrade_tables.resize(max_size)
+
+
+def set_hit_counting(enabled=True):
+    """Count hits of downgrade tables, for cache_info().
+
+    This takes an extra pass over the text of each call, so it is off
+    by default.
+    """
+    downgrade_tables.set_count_lookups(enabled)
+
+
+def set_memo_size(max_size, max_length=DEFAULT_MEMO_MAX_LENGTH):
+    """Cache whole results of downgrade() for text up to max_length.
+
+    Up to max_size results are kept, the least recently used ones
+    being dropped first. None lifts the limit, and 0 turns this off.
+    """
+    memo.resize(max_size, max_length)
+
+
+def memo_info():
+    """Report statistics of the cache set by set_memo_size().
+    """
+    return memo.info()
+
+
+def set_disk_cache(path=diskcache.get_default_cache_dir()):
+    """Keep resolved downgrade tables in a directory across restarts.
+
+    Tables are loaded as they are first used, and saved on exit
+    or by save_disk_cache(). The directory defaults to the per-user
+    cache directory, and None turns this off.
+    """
+    if path is None:
+        downgrade_tables.store = None
+        return
+    downgrade_tables.store = diskcache.DiskStore(path, _get_identity())
+    for encoding, table in downgrade_tables.items():
+        table.preload(downgrade_tables.store.load(encoding))
+
+
+def export_shared_tables(path):
+    """Write resolved downgrade tables to flat files in a directory.
+
+    Other processes attach them with attach_shared_tables(). A directory
+    in a tmpfs such as /dev/shm keeps them in shared memory only.
+    """
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    identity = _get_identity()
+    for encoding, table in downgrade_tables.items():
+        entries = table.get_resolved()
+        shared_table = shared_tables.get(encoding)
+        if shared_table is not None:
+            entries.update(shared_table.items())
+        flattable.save(os.path.join(path, encoding + SHARED_TABLE_EXT),
+                       entries, identity)
+
+
+def attach_shared_tables(path):
+    """Resolve characters from tables written by export_shared_tables().
+
+    Files are mmap'ed, so that all attached processes share one copy
+    instead of resolving characters each. None detaches them. With the
+    Cython version, downgrade() reads entries from that copy on each
+    call; otherwise they are copied into each process' table on first
+    use, and only the resolution cost is shared.
+    """
+    shared_tables.clear()
+    if path is None:
+        return
+    identity = _get_identity()
+    for file_name in os.listdir(path):
+        encoding, ext = os.path.splitext(file_name)
+        if ext != SHARED_TABLE_EXT:
+            continue
+        try:
+            shared_table = flattable.FlatTable.open(
+                os.path.join(path, file_name))
+        except (EnvironmentError, ValueError):
+            continue
+        # Tables resolved by another setup may differ.
+        if shared_table.identity == identity:
+            shared_tables[encoding] = shared_table
+
+
+def _get_identity():
+    return diskcache.get_identity(iconv_str and get_iconv_identity())
+
+
+def save_disk_cache():
+    """Save downgrade tables, if set_disk_cache() has been called.
+    """
+    downgrade_tables.save()
+
+
+def purge(encoding=None):
+    """Clear caches, for one encoding or for all.
+
+    Results cached by set_memo_size() are cleared for all encodings.
+    """
+    memo.clear()
+    if encoding is None:
+        needs_substitution_cache.clear()
+        substitution_res.clear()
+        tail_res.clear()
+        unencodable_res.clear()
+        encodable_ranges.clear()
+        downgrade_tables.clear()
+    else:
+        encoding = codecs.lookup(encoding).name
+        for key in list(needs_substitution_cache):
+            if key[1] == encoding:
+                del needs_substitution_cache[key]
+        substitution_res.pop(encoding, None)
+        tail_res.pop(encoding, None)
+        unencodable_res.pop(encoding, None)
+        encodable_ranges.pop(encoding, None)
+        downgrade_tables.pop(encoding)
+
+
+atexit.register(save_disk_cache)
+
+if os.environ.get(diskcache.CACHE_DIR_ENV):
+    set_disk_cache(os.environ[diskcache.CACHE_DIR_ENV])
@@ -0,0 +1,126 @@
+"""Flat binary tables from code points to strings
+
+A table is laid out in a single buffer, so that processes can share one copy
+through an mmap'ed file or multiprocessing.shared_memory:
+
+    header      magic, key and string counts, identity size, then identity
+    keys        sorted code points, as native uint32
+    indexes     index of the string of each key, as native uint32
+    offsets     start of each distinct string in the pool, then the end
+    pool        distinct strings, in UTF-8
+"""
+import array
+import bisect
+import mmap
+import os
+import struct
+import sys
+import tempfile
+
+
+MAGIC = b"TRFT"
+HEADER = struct.Struct("=4sIII")
+
+
+def pack(entries, identity="") -> bytes:
+    """Lay out a mapping from code points to strings.
+    """
+    keys = sorted(entries)
+    strings = {}
+    indexes = array.array("I", [strings.setdefault(entries[key], len(strings))
+                                for key in keys])
+    offsets, pool = pack_strings(strings)
+    identity = identity.encode("utf-8")
+    header = HEADER.pack(MAGIC, len(keys), len(strings), len(identity))
+    padding = b"\0" * (-(len(header) + len(identity)) % 4)
+    return b"".join([header, identity, padding,
+                     array.array("I", keys).tobytes(), indexes.tobytes(),
+                     offsets.tobytes(), pool])
+
+
+def pack_strings(strings, encoding="utf-8", errors="surrogatepass"):
+    """Concatenate distinct strings into a pool.
+
+    Offsets hold the start of each string, then the end of the last one.
+    """
+    offsets = array.array("I", [0])
+    pool = bytearray()
+    for string in strings:
+        pool += string.encode(encoding, errors)
+        offsets.append(len(pool))
+    return offsets, bytes(pool)
+
+
+def cast(view, start, format, count, #@ReservedAssignment
+         byteorder=sys.byteorder):
+    """Read count items of a struct format from a buffer at start.
+
+    Items are read in place, unless they have to be byte-swapped.
+    """
+    end = start + count * struct.calcsize(format)
+    a = view[start:end].cast(format)
+    if byteorder != sys.byteorder:
+        a = array.array(format, a)
+        a.byteswap()
+    return a, end
+
+
+def save(path, entries, identity=""):
+    """Write a table to a file, atomically.
+    """
+    fd, temp_path = tempfile.mkstemp(".tmp", dir=os.path.dirname(path))
+    try:
+        with open(fd, "wb") as f:
+            f.write(pack(entries, identity))
+        os.replace(temp_path, path)
+    except:
+        os.remove(temp_path)
+        raise
+
+
+class FlatTable(object):
+    """Read-only table over a buffer laid out by pack()
+
+    Strings are decoded on each lookup, nothing else is copied.
+    """
+    def __init__(self, buffer):
+        view = memoryview(buffer)
+        magic, key_count, string_count, identity_size = \
+            HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError("not a flat table")
+        start = HEADER.size
+        self.identity = str(view[start:start + identity_size], "utf-8")
+        start += identity_size + (-(start + identity_size) % 4)
+        self.keys, start = cast(view, start, "I", key_count)
+        self.indexes, start = cast(view, start, "I", key_count)
+        self.offsets, start = cast(view, start, "I", string_count + 1)
+        self.pool = view[start:]
+        self.buffer = buffer
+
+    @classmethod
+    def open(cls, path):
+        """Map a file written by save() into memory.
+        """
+        with open(path, "rb") as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, code_point):
+        return self.get(code_point) is not None
+
+    def get(self, code_point, default=None):
+        i = bisect.bisect_left(self.keys, code_point)
+        if i == len(self.keys) or self.keys[i] != code_point:
+            return default
+        return self._get_string(self.indexes[i])
+
+    def items(self):
+        for code_point, index in zip(self.keys, self.indexes):
+            yield code_point, self._get_string(index)
+
+    def _get_string(self, index):
+        return str(self.pool[self.offsets[index]:self.offsets[index + 1]],
+                   "utf-8", "surrogatepass")
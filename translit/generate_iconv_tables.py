@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""Precompute iconv transliterations for downgrade()
+
+The result is only used on hosts with the same iconv identity,
+as transliterations depend on the C library and the LC_CTYPE locale.
+"""
+import codecs
+import json
+import os
+import sys
+import unicodedata
+import zipfile
+SCRIPT_DIR = os.path.dirname(__file__)
+sys.path.insert(0, os.path.join(SCRIPT_DIR, ".."))
+
+from translit.downgrade import (ICONV_TABLES_PATH, UNICODE_SUBS,
+                                IConvError, iconv_str, get_iconv_identity)
+
+
+EXTRA_ENCODINGS = [
+    "ascii",
+    "cp437",
+    "cp850",
+    "cp1250",
+    "cp1251",
+    "cp1252",
+    "cp1253",
+    "cp1254",
+    "cp1257",
+]
+
+# Unassigned and surrogate code points have no transliteration,
+# so downgrade() goes straight to unidecode for them.
+SKIPPED_CATEGORIES = {"Cn", "Cs"}
+
+BLOCK_SIZE = 0x400
+
+
+def get_encodings():
+    from translit.iconv import ENCODING_MAP
+
+    encodings = set()
+    for name in set(ENCODING_MAP) | set(ENCODING_MAP.values()) | \
+            set(EXTRA_ENCODINGS):
+        try:
+            encoding = codecs.lookup(name).name
+            "\n".encode(encoding)
+        except (LookupError, UnicodeError):
+            continue
+        # Unicode encodings have nothing to transliterate.
+        if not encoding.startswith("utf"):
+            encodings.add(encoding)
+    return sorted(encodings)
+
+
+def is_stateful(encoding):
+    return encoding.startswith("iso2022") or encoding == "hz"
+
+
+def iconv_translit(chars, encoding):
+    """Transliterate characters with iconv, one result per character.
+
+    Characters are joined by newlines to convert a whole block at once.
+    Blocks that fail are split until the culprit is found. Characters
+    iconv can't transliterate give None.
+    """
+    text = "\n".join(UNICODE_SUBS.get(c, c) for c in chars)
+    try:
+        segments = iconv_str(text, encoding, "translit").split(b"\n")
+        if len(segments) != len(chars):
+            raise ValueError("newline in transliteration")
+        return [None if b"?" in segment else segment.decode(encoding)
+                for segment in segments]
+    except (IConvError, ValueError):
+        if len(chars) == 1:
+            return [None]
+        middle = len(chars) // 2
+        return (iconv_translit(chars[:middle], encoding) +
+                iconv_translit(chars[middle:], encoding))
+
+
+def generate_table(encoding, chars):
+    chars = [c for c in chars if not is_encodable(c, encoding)]
+    block_size = 1 if is_stateful(encoding) else BLOCK_SIZE
+    table = {}
+    for start in range(0, len(chars), block_size):
+        block = chars[start:start + block_size]
+        for c, repl in zip(block, iconv_translit(block, encoding)):
+            if repl is not None:
+                table[str(ord(c))] = repl
+    return table
+
+
+def is_encodable(c, encoding):
+    try:
+        c.encode(encoding)
+    except UnicodeEncodeError:
+        return False
+    return True
+
+
+def generate_iconv_tables(overwrite=False):
+    if os.path.isfile(ICONV_TABLES_PATH) and not overwrite:
+        return
+    if not iconv_str:
+        print("iconv is unavailable; no table has been generated.")
+        return
+
+    write_iconv_tables(ICONV_TABLES_PATH, get_encodings(), get_chars())
+    print("{!r} has been generated.".format(ICONV_TABLES_PATH))
+
+
+def get_chars(start=0x80, end=sys.maxunicode + 1):
+    return [c for c in map(chr, range(start, end))
+            if unicodedata.category(c) not in SKIPPED_CATEGORIES]
+
+
+def write_iconv_tables(path, encodings, chars):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as f:
+        f.writestr("identity", get_iconv_identity().encode("utf-8"))
+        for encoding in encodings:
+            table = generate_table(encoding, chars)
+            f.writestr(encoding + ".json", json.dumps(
+                table, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+            print("{}: {} transliterations".format(encoding, len(table)))
+
+
+if __name__ == "__main__":
+    sys.exit(generate_iconv_tables(overwrite=True))
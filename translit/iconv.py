@@ -1,7 +1,10 @@
 """Bindings for libiconv
 """
 import sys
+import errno
+import locale
 import os
+import platform
 import warnings
 
 from ctypes import (CDLL, CFUNCTYPE, POINTER,
@@ -11,7 +14,7 @@ from ctypes import (CDLL, CFUNCTYPE, POINTER,
 from ctypes.util import find_library
 
 
-__all__ = ["iconv", "iconv_str"]
+__all__ = ["iconv", "iconv_str", "get_identity"]
 
 DEFAULT_TO_CODE = "ascii"
 ENCODING_MAP = {
@@ -77,6 +80,8 @@ ENCODING_MAP = {
     "utf-32-le": "utf-32le",
 }
 
+LIB_PATH = None
+
 UNICODE_TRANS = {
     8239: '\xa0',
     8451: '°C',
@@ -107,24 +112,9 @@ def iconv(buf: bytes, to_code=DEFAULT_TO_CODE, to_suffix=None,
     from_code = ENCODING_MAP.get(from_code, from_code)
     if to_suffix:  # "translit" or "ignore"
         to_code += "//" + to_suffix
-    cd = _iconv_open(to_code.encode(), from_code.encode())
-    if cd == -1:
-        raise Error()
-    try:
-        in_len = len(buf)
-        in_buf = create_string_buffer(buf, in_len)
-        in_bytes_left = c_size_t(sizeof(in_buf))
-        out_capacity = in_len * 4 + 4
-        out_bytes_left = c_size_t(out_capacity)
-        out_buf = create_string_buffer(out_bytes_left.value)
-        n = _iconv(cd,
-                   byref(cast(in_buf, c_char_p)), byref(in_bytes_left),
-                   byref(cast(out_buf, c_char_p)), byref(out_bytes_left))
-        if n == -1:
-            raise Error()
-    finally:
-        _iconv_close(cd)
-    return out_buf.raw[:out_capacity - out_bytes_left.value]
+    in_buf = create_string_buffer(buf, len(buf))
+    return _convert(in_buf, to_code.encode(), from_code.encode(),
+                    len(buf) * 4 + 4)
 
 
 def iconv_str(text: str, to_code=DEFAULT_TO_CODE, to_suffix=None) -> bytes:
@@ -133,28 +123,52 @@ def iconv_str(text: str, to_code=DEFAULT_TO_CODE, to_suffix=None) -> bytes:
     to_code = ENCODING_MAP.get(to_code, to_code)
     if to_suffix:
         to_code += "//" + to_suffix
-    cd = _iconv_open(to_code.encode(), b"wchar_t")
-    if cd == -1:
-        raise Error()
-    try:
-        in_len = len(text)
-        in_buf = create_unicode_buffer(text, in_len)
-        in_bytes_left = c_size_t(sizeof(in_buf))
-        out_capacity = in_len * 4 + 4
-        out_bytes_left = c_size_t(out_capacity)
-        out_buf = create_string_buffer(out_bytes_left.value)
-        n = _iconv(cd,
-                   byref(cast(in_buf, c_char_p)), byref(in_bytes_left),
-                   byref(cast(out_buf, c_char_p)), byref(out_bytes_left))
-        if n == -1:
+    in_buf = create_unicode_buffer(text, len(text))
+    return _convert(in_buf, to_code.encode(), b"wchar_t",
+                    len(text) * 4 + 4)
+
+
+def _convert(in_buf, to_code, from_code, out_capacity):
+    while True:
+        cd = _iconv_open(to_code, from_code)
+        if cd == -1:
             raise Error()
-    finally:
-        _iconv_close(cd)
-    return out_buf.raw[:out_capacity - out_bytes_left.value]
+        try:
+            in_bytes_left = c_size_t(sizeof(in_buf))
+            out_bytes_left = c_size_t(out_capacity)
+            out_buf = create_string_buffer(out_capacity)
+            out_ptr = cast(out_buf, c_char_p)
+            n = _iconv(cd,
+                       byref(cast(in_buf, c_char_p)), byref(in_bytes_left),
+                       byref(out_ptr), byref(out_bytes_left))
+            if n == -1:
+                raise Error()
+            # Flush characters some converters hold back, like Shift_JISX0213.
+            n = _iconv(cd, None, None, byref(out_ptr), byref(out_bytes_left))
+            if n == -1:
+                raise Error()
+        except Error as e:
+            if e.errno != errno.E2BIG:
+                raise
+            # Transliterations can take many bytes per character.
+            out_capacity *= 4
+            continue
+        finally:
+            _iconv_close(cd)
+        return out_buf.raw[:out_capacity - out_bytes_left.value]
+
+
+def get_identity() -> str:
+    """Describe the iconv implementation in use.
+
+    Transliterations depend on the library and on the LC_CTYPE locale.
+    """
+    return " ".join([str(LIB_PATH)] + list(platform.libc_ver()) +
+                    [str(locale.setlocale(locale.LC_CTYPE))])
 
 
 def declare_libiconv_funcs():
-    global _iconv_open, _iconv, _iconv_close, iconv, iconv_str
+    global _iconv_open, _iconv, _iconv_close, iconv, iconv_str, LIB_PATH
 
     if os.name == "nt":
         base_dirs = [os.path.dirname(sys.argv[0])]
@@ -184,22 +198,24 @@ def declare_libiconv_funcs():
         else:
             raise OSError("can’t find libiconv")
 
-        libiconv_open = lib.libiconv_open
-        libiconv = lib.libiconv
-        libiconv_close = lib.libiconv_close
+        libiconv_open = ("libiconv_open", lib)
+        libiconv = ("libiconv", lib)
+        libiconv_close = ("libiconv_close", lib)
         test_features = True
     else:
         lib_path = find_library("c")
         if not lib_path:
             raise OSError("can’t find libiconv")
         lib = CDLL(lib_path, use_errno=True)
-        libiconv_open = lib.iconv_open
-        libiconv = lib.iconv
-        libiconv_close = lib.iconv_close
+        libiconv_open = ("iconv_open", lib)
+        libiconv = ("iconv", lib)
+        libiconv_close = ("iconv_close", lib)
         test_features = False
 
+    LIB_PATH = lib_path
+
     # iconv_t iconv_open (const char* tocode, const char* fromcode);
-    p = CFUNCTYPE(c_ssize_t, c_char_p, c_char_p)
+    p = CFUNCTYPE(c_ssize_t, c_char_p, c_char_p, use_errno=True)
     _iconv_open = p(libiconv_open)
 
     # size_t iconv (iconv_t cd,
@@ -207,11 +223,11 @@ def declare_libiconv_funcs():
     #               char **out_buf, size_t *out_bytes_left);
     p = CFUNCTYPE(c_ssize_t, c_ssize_t,
                   POINTER(c_char_p), POINTER(c_size_t),
-                  POINTER(c_char_p), POINTER(c_size_t))
+                  POINTER(c_char_p), POINTER(c_size_t), use_errno=True)
     _iconv = p(libiconv)
 
     # int iconv_close (iconv_t cd);
-    p = CFUNCTYPE(c_int, c_ssize_t)
+    p = CFUNCTYPE(c_int, c_ssize_t, use_errno=True)
     _iconv_close = p(libiconv_close)
 
     if test_features:
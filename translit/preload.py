@@ -0,0 +1,44 @@
+"""Eager loading of tables, for processes that fork workers
+"""
+import codecs
+import gc
+
+from .downgrade import (DEFAULT_ENCODING, downgrade_tables,
+                        _get_unencodable_re, _split_tail, _substitute)
+from .unidecode import unidecode
+from .unidecode.tablefile import TABLE_SIZE
+from .upgrade import fix_spelling
+
+
+# Latin, Greek, Cyrillic and the like, then punctuation and symbols.
+DEFAULT_BLOCKS = (0x00, 0x04)
+
+
+def preload(encodings=(DEFAULT_ENCODING,), languages=(),
+            blocks=DEFAULT_BLOCKS, freeze=True):
+    """Load tables eagerly, so that forked workers start warm.
+
+    Downgrade tables of the given encodings get resolved for the given
+    blocks of unidecode tables, block n spanning code points from
+    n * 0x800. Spelling dictionaries of the given languages are opened.
+    Then, objects are moved out of reach of the garbage collector with
+    gc.freeze(), which keeps their pages shared after fork().
+    """
+    code_points = [code_point for block in blocks
+                   for code_point in range(block * TABLE_SIZE,
+                                           (block + 1) * TABLE_SIZE)]
+    unidecode("".join(map(chr, code_points)))
+    for encoding in encodings:
+        encoding = codecs.lookup(encoding).name
+        _get_unencodable_re(encoding)
+        _substitute("", encoding)
+        _split_tail("", encoding)
+        table = downgrade_tables[encoding]
+        for code_point in code_points:
+            table[code_point]
+    for language in languages:
+        # Opens the dictionary.
+        fix_spelling("", language)
+    if freeze and hasattr(gc, "freeze"):
+        gc.collect()
+        gc.freeze()
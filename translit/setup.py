@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+
+try:
+    from setuptools import setup, Extension
+except ImportError:
+    from distutils.core import setup
+    from distutils.extension import Extension
+from Cython.Build import cythonize
+
+
+if __name__ == "__main__":
+    PYX_FILENAME = "_downgrade.pyx"
+
+    if os.name == "posix":
+        EXTRA_COMPILE_ARGS = ["-Ofast"]
+    else:
+        EXTRA_COMPILE_ARGS = []
+
+    # iconv is part of glibc, but a separate library elsewhere.
+    if sys.platform.startswith("linux"):
+        LIBRARIES = []
+    else:
+        LIBRARIES = ["iconv"]
+
+    setup(
+        ext_modules=cythonize([
+            Extension("_downgrade", [PYX_FILENAME],
+            extra_compile_args=EXTRA_COMPILE_ARGS,
+            libraries=LIBRARIES)
+        ]),
+    )
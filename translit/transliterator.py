@@ -0,0 +1,75 @@
+"""Transliteration with settings resolved once
+"""
+import codecs
+import locale
+import warnings
+
+from .downgrade import DEFAULT_ENCODING, _downgrade, _isascii
+from .unidecode import unidecode
+from .upgrade import _apply_subs, get_dict, get_subs, spell
+
+
+MODES = {"downgrade", "unidecode"}
+
+
+class Transliterator(object):
+    """Transliterator between Unicode and one encoding
+
+    The encoding name, the language, its substitutions and its spelling
+    dictionary are resolved on creation rather than on each call. In "downgrade" mode, text is
+    downgraded like with downgrade(). In "unidecode" mode, it is
+    transliterated into ASCII with unidecode().
+    """
+    def __init__(self, encoding=DEFAULT_ENCODING, language=None,
+                 mode="downgrade"):
+        if mode not in MODES:
+            raise ValueError("unknown mode: {!r}".format(mode))
+        if language is None:
+            language = locale.getdefaultlocale()[0]
+        self.encoding = codecs.lookup(encoding).name
+        self.language = language
+        self.mode = mode
+        self.subs = get_subs(language)
+        self.dict = _get_dict(language)
+
+    def __repr__(self):
+        return "{}(encoding={!r}, language={!r}, mode={!r})".format(
+            type(self).__name__, self.encoding, self.language, self.mode)
+
+    def downgrade(self, text: str) -> str:
+        """Downgrade text to fit into the encoding.
+        """
+        if _isascii(text):
+            return text
+        if self.mode == "unidecode":
+            return unidecode(text)
+        return _downgrade(text, self.encoding)
+
+    def upgrade(self, text: str) -> str:
+        """Try to undo a downgraded transliteration.
+        """
+        text = _apply_subs(text, self.subs)
+        if self.dict is not None:
+            return self.dict.autofix(text)
+        return text
+
+    def encode(self, text: str, errors="strict") -> bytes:
+        """Downgrade text, then encode it.
+        """
+        return self.downgrade(text).encode(self.encoding, errors)
+
+    def decode(self, data, errors="strict") -> str:
+        """Decode data, then upgrade it.
+        """
+        return self.upgrade(bytes(data).decode(self.encoding, errors))
+
+
+def _get_dict(language):
+    if not spell:
+        return None
+    try:
+        return get_dict(language)
+    except spell.errors.DictNotFoundError:
+        warnings.warn(
+            "dictionary not found for language: {!r}".format(language))
+        return None
@@ -27,6 +27,10 @@
 #   You should have received a copy of the GNU General Public License
 #   along with this program. If not, see <http://www.gnu.org/licenses/>.
 
+# Importing a submodule sets it as an attribute of its package, but only
+# the first time: import this one before binding the unidecode function.
+from . import unidecode #@UnusedImport
+
 try:
     from ._unidecode import unidecode, SOURCE_CODE_LANGUAGE
 except ImportError:
@@ -2,12 +2,10 @@
 # cython: language_level=3
 # cython: cdivision=True
 
-from libc.stdlib cimport malloc, free
-from cython.operator import postincrement as postinc
+from libc.stdint cimport uint64_t
+from libc.string cimport memcpy, strlen
 
 
-DEF USE_LEGACY_UNICODE_API = True
-
 SOURCE_CODE_LANGUAGE = "Cython"
 
 cdef enum PyUnicode_Kind:
@@ -16,52 +14,26 @@ cdef enum PyUnicode_Kind:
     PyUnicode_4BYTE_KIND = 4
 
 cdef extern from "Python.h":
-    # Python 3.3+
-    cdef int PyUnicode_READY(object o)
+    ctypedef unsigned char Py_UCS1
+    ctypedef unsigned short Py_UCS2
+    cdef int PyUnicode_READY(object o) except -1
+    cdef int PyUnicode_IS_ASCII(object o)
     cdef int PyUnicode_KIND(object o)
-    cdef Py_UCS4 PyUnicode_READ(int kind, void *data, Py_ssize_t index) nogil
     cdef void *PyUnicode_DATA(object o)
     cdef Py_ssize_t PyUnicode_GET_LENGTH(object o)
-    cdef object PyUnicode_FromKindAndData(int kind, void *buffer,
-                                          Py_ssize_t size)
-
-    # Deprecated
-    cdef Py_UNICODE *PyUnicode_AS_UNICODE(object o)
-    cdef Py_ssize_t PyUnicode_GET_SIZE(object o)
-    cdef object PyUnicode_FromUnicode(Py_UNICODE *u, Py_ssize_t size)
-
-    cdef object PyUnicode_FromStringAndSize(char *u, Py_ssize_t size)
-
-IF USE_LEGACY_UNICODE_API:
-    cdef inline int PyUnicode_READY(object o):
-        return 0
+    cdef object PyUnicode_New(Py_ssize_t size, Py_UCS4 maxchar)
 
-    cdef inline int PyUnicode_KIND(object o):
-        return sizeof(Py_UNICODE)
+# High bits of the bytes of a word, all clear if all bytes are ASCII.
+cdef uint64_t NON_ASCII_MASK = 0x8080808080808080
 
-    cdef inline Py_UCS4 PyUnicode_READ(int kind, void *data,
-                                       Py_ssize_t index) nogil:
-        return (<Py_UNICODE *>data)[index]
-
-    cdef inline void *PyUnicode_DATA(object o):
-        return PyUnicode_AS_UNICODE(o)
-
-    cdef inline Py_ssize_t PyUnicode_GET_LENGTH(object o):
-        return PyUnicode_GET_SIZE(o)
-
-    cdef inline object PyUnicode_FromKindAndData(int kind, void *buffer,
-                                                 Py_ssize_t size):
-        if kind == 1:
-            # Can't have a real PyUnicode_1BYTE_KIND PyUnicode.
-            return PyUnicode_FromStringAndSize(<char *>buffer, size)
-        elif kind == sizeof(Py_UNICODE):
-            return PyUnicode_FromUnicode(<Py_UNICODE *>buffer, size)
-        raise ValueError("can’t emulate PyUnicode kind: {}".format(kind))
+ctypedef fused ucs_t:
+    Py_UCS1
+    Py_UCS2
+    Py_UCS4
 
 cdef extern from "table.h":
     char *TABLE[]
     size_t TABLE_SIZE
-    size_t MAX_LEN
 
 
 def unidecode(str text) -> str:
@@ -70,54 +42,103 @@ def unidecode(str text) -> str:
     cdef int kind
     cdef void *buf
     cdef Py_ssize_t length
-    cdef char *out_buf
-    cdef Py_ssize_t out_capacity
     cdef Py_ssize_t out_length
+    cdef object out
 
-    if PyUnicode_READY(text) < 0:
-        raise MemoryError
+    PyUnicode_READY(text)
+    if PyUnicode_IS_ASCII(text):
+        return text
     kind = PyUnicode_KIND(text)
     buf = PyUnicode_DATA(text)
     length = PyUnicode_GET_LENGTH(text)
 
-    out_capacity = length * MAX_LEN
-    out_buf = <char *>malloc(sizeof(char) * out_capacity)
-
-    if out_buf == NULL:
-        raise MemoryError
-
-    try:
-        with nogil:
-            _unidecode(kind, buf, length, out_buf, out_capacity, &out_length)
-        return PyUnicode_FromKindAndData(PyUnicode_1BYTE_KIND,
-                                         out_buf, out_length)
-    finally:
-        free(out_buf)
-
-
-cdef inline int _unidecode(int kind, void *buf, Py_ssize_t length,
-                           char *out_buf, size_t out_capacity,
-                           Py_ssize_t *pout_length) nogil:
-    cdef Py_ssize_t i
+    with nogil:
+        if kind == PyUnicode_1BYTE_KIND:
+            out_length = _get_out_length(<Py_UCS1 *>buf, length)
+        elif kind == PyUnicode_2BYTE_KIND:
+            out_length = _get_out_length(<Py_UCS2 *>buf, length)
+        else:
+            out_length = _get_out_length(<Py_UCS4 *>buf, length)
+
+    # Written in place, as an ASCII str is laid out as a char array.
+    out = PyUnicode_New(out_length, 0x7f)
+    _unidecode_kind(kind, buf, length, <char *>PyUnicode_DATA(out))
+    return out
+
+
+cdef inline void _unidecode_kind(int kind, void *buf, Py_ssize_t length,
+                                 char *out_buf) noexcept:
+    with nogil:
+        if kind == PyUnicode_1BYTE_KIND:
+            _unidecode(<Py_UCS1 *>buf, length, out_buf)
+        elif kind == PyUnicode_2BYTE_KIND:
+            _unidecode(<Py_UCS2 *>buf, length, out_buf)
+        else:
+            _unidecode(<Py_UCS4 *>buf, length, out_buf)
+
+
+cdef inline Py_ssize_t _get_out_length(const ucs_t *buf,
+                                       Py_ssize_t length) noexcept nogil:
+    cdef Py_ssize_t i = 0
     cdef Py_UCS4 uch
-    cdef char *po, *po_max
-    cdef char *pi
-
-    po = out_buf
-    po_max = po + out_capacity - 1
+    # ASCII characters are counted here, other ones get corrected.
+    cdef Py_ssize_t out_length = length
 
-    for i in range(length):
-        uch = PyUnicode_READ(kind, buf, i)
-        if uch < 0x80:
-            if po > po_max:
+    while i < length:
+        if ucs_t is Py_UCS1:
+            i += _count_ascii(buf + i, length - i)
+            if i == length:
+                break
+        uch = buf[i]
+        i += 1
+        if uch >= 0x80:
+            out_length -= 1
+            if uch < TABLE_SIZE:
+                out_length += strlen(TABLE[uch])
+    return out_length
+
+
+cdef inline void _unidecode(const ucs_t *buf, Py_ssize_t length,
+                            char *out_buf) noexcept nogil:
+    cdef Py_ssize_t i = 0
+    cdef Py_ssize_t n
+    cdef Py_UCS4 uch
+    cdef char *po = out_buf
+    cdef const char *pi
+
+    while i < length:
+        if ucs_t is Py_UCS1:
+            # ASCII runs are already laid out like the result.
+            n = _count_ascii(buf + i, length - i)
+            memcpy(po, buf + i, n)
+            po += n
+            i += n
+            if i == length:
                 break
-            postinc(po)[0] = uch
-            continue
-        if uch >= TABLE_SIZE:
-            continue
-        pi = <char *>TABLE[uch]
-        while pi[0] and po <= po_max:
-            postinc(po)[0] = postinc(pi)[0]
-
-    pout_length[0] = po - out_buf
-    return 0 if po <= po_max else -1
+        uch = buf[i]
+        i += 1
+        if uch < 0x80:
+            po[0] = <char>uch
+            po += 1
+        elif uch < TABLE_SIZE:
+            pi = TABLE[uch]
+            while pi[0]:
+                po[0] = pi[0]
+                po += 1
+                pi += 1
+
+
+cdef inline Py_ssize_t _count_ascii(const Py_UCS1 *buf,
+                                    Py_ssize_t length) noexcept nogil:
+    cdef Py_ssize_t i = 0
+    cdef uint64_t word
+
+    # A word at a time, then a byte at a time.
+    while i + <Py_ssize_t>sizeof(word) <= length:
+        memcpy(&word, buf + i, sizeof(word))
+        if word & NON_ASCII_MASK:
+            break
+        i += sizeof(word)
+    while i < length and buf[i] < 0x80:
+        i += 1
+    return i
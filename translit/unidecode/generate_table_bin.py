@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""Pack the unidecode tables into table.bin
+
+Each tables/0xNN.py module holds a TABLE list of the transliterations
+of block NN, that is TABLE_SIZE code points from NN * TABLE_SIZE.
+Missing modules stand for blocks without any transliteration.
+"""
+import ast
+import glob
+import os
+import sys
+SCRIPT_DIR = os.path.dirname(__file__)
+sys.path.insert(0, os.path.join(SCRIPT_DIR, "../.."))
+
+from translit.unidecode.tablefile import TABLE_PATH, TABLE_SIZE, pack
+
+
+TABLES_DIR = os.path.join(SCRIPT_DIR, "tables")
+
+
+def read_tables(tables_dir=TABLES_DIR):
+    """Read the transliterations of all blocks, one per code point.
+    """
+    blocks = {}
+    for path in glob.glob(os.path.join(tables_dir, "0x*.py")):
+        name = os.path.splitext(os.path.basename(path))[0]
+        with open(path, encoding="utf-8") as f:
+            source = f.read()
+        table = ast.literal_eval(source.split("=", 1)[1].strip())
+        if len(table) != TABLE_SIZE:
+            raise ValueError("{!r} has {} entries".format(path, len(table)))
+        blocks[int(name, 16)] = table
+    strings = []
+    for block in range(max(blocks) + 1):
+        strings.extend(blocks.get(block, [""] * TABLE_SIZE))
+    return strings
+
+
+def generate_table_bin(overwrite=False):
+    if os.path.isfile(TABLE_PATH) and not overwrite:
+        return
+
+    with open(TABLE_PATH, "wb") as f:
+        f.write(pack(read_tables()))
+
+    print("{!r} has been generated.".format(TABLE_PATH))
+
+
+if __name__ == "__main__":
+    sys.exit(generate_table_bin(overwrite=True))
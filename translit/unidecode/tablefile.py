@@ -0,0 +1,104 @@
+"""Binary table of unidecode() transliterations
+
+The table is laid out in a single little-endian file, meant to be mapped
+into memory rather than loaded:
+
+    header      magic, block, table and string counts
+    blocks      for each block of TABLE_SIZE code points, 0 if all of its
+                transliterations are empty, else 1 + its table index, as uint16
+    tables      string index of each code point of a block, as uint16
+    offsets     start of each distinct string in the pool, then the end,
+                as uint32
+    pool        distinct strings, in ASCII, the empty string being first
+"""
+import array
+import mmap
+import os
+import struct
+import sys
+
+from ..flattable import cast, pack_strings
+
+
+MAGIC = b"TRUD"
+HEADER = struct.Struct("<4sIII")
+TABLE_SIZE = 0x800
+TABLE_PATH = os.path.join(os.path.dirname(__file__), "table.bin")
+
+
+def pack(strings) -> bytes:
+    """Lay out a sequence of transliterations, one per code point.
+    """
+    pool_index = {"": 0}
+    blocks = array.array("H")
+    tables = array.array("H")
+    for start in range(0, len(strings), TABLE_SIZE):
+        block = strings[start:start + TABLE_SIZE]
+        if not any(block):
+            blocks.append(0)
+            continue
+        block = list(block) + [""] * (TABLE_SIZE - len(block))
+        tables.extend(pool_index.setdefault(string, len(pool_index))
+                      for string in block)
+        blocks.append(len(tables) // TABLE_SIZE)
+    offsets, pool = pack_strings(pool_index, "ascii", "strict")
+    if sys.byteorder == "big":
+        for a in (blocks, tables, offsets):
+            a.byteswap()
+    header = HEADER.pack(MAGIC, len(blocks), len(tables) // TABLE_SIZE,
+                         len(pool_index))
+    padding = b"\0" * (-(len(header) + len(blocks) * 2 + len(tables) * 2) % 4)
+    return b"".join([header, blocks.tobytes(), tables.tobytes(), padding,
+                     offsets.tobytes(), pool])
+
+
+class Table(object):
+    """Transliterations of all code points, over a buffer laid out by pack()
+
+    Code points are found through their block, without any search.
+    """
+    def __init__(self, buffer):
+        view = memoryview(buffer)
+        magic, block_count, table_count, string_count = \
+            HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError("not a unidecode table")
+        start = HEADER.size
+        self.blocks, start = cast(view, start, "H", block_count, "little")
+        self.tables, start = cast(view, start, "H", table_count * TABLE_SIZE,
+                                  "little")
+        start += -start % 4
+        self.offsets, start = cast(view, start, "I", string_count + 1,
+                                   "little")
+        self.pool = view[start:]
+        self.buffer = buffer
+
+    @classmethod
+    def open(cls, path=TABLE_PATH):
+        """Map a table file into memory.
+        """
+        with open(path, "rb") as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def __len__(self):
+        return len(self.blocks) * TABLE_SIZE
+
+    def __getitem__(self, code_point):
+        return self.get_string(self.get_index(code_point))
+
+    def get_index(self, code_point) -> int:
+        """Get the index of the transliteration of a code point.
+
+        Equal transliterations share the same index, 0 being empty.
+        """
+        block, index = divmod(code_point, TABLE_SIZE)
+        if block >= len(self.blocks):
+            return 0
+        table = self.blocks[block]
+        if not table:
+            return 0
+        return self.tables[(table - 1) * TABLE_SIZE + index]
+
+    def get_string(self, index) -> str:
+        return str(self.pool[self.offsets[index]:self.offsets[index + 1]],
+                   "ascii")
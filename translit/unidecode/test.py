@@ -12,6 +12,7 @@ except ImportError:
     from translit.unidecode.unidecode import unidecode, SOURCE_CODE_LANGUAGE
 else:
     from translit.unidecode.unidecode import unidecode as unidecode_py
+from translit.unidecode.tablefile import TABLE_SIZE, Table, pack
 
 
 class TestUnidecode(unittest.TestCase):
@@ -21,10 +22,20 @@ class TestUnidecode(unittest.TestCase):
             ("北亰", "Bei Jing "),
             ("500\xa0€", "500 EUR"),
             ("☺", ":-)"),
+            ("Ça a été « préparé » à Noël", 'Ca a ete << prepare >> a Noel'),
         ]
         for text, result in tests:
             self.assertEqual(unidecode(text), result)
 
+    def test_ascii(self):
+        text = "Plain ASCII text, " * 3
+        self.assertIs(unidecode(text), text)
+        for c in ["é", "€", "\U0001d400"]:
+            for n in range(40):
+                text = (c + "a" * n) * 2 + "b" * n
+                self.assertEqual(unidecode(text), text.replace(
+                    c, unidecode(c)))
+
     def test_result(self):
         for n in range(128):
             c = chr(n)
@@ -37,6 +48,14 @@ class TestUnidecode(unittest.TestCase):
         for n in range(sys.maxunicode + 1):
             unidecode(chr(n)).encode("ascii")
 
+    def test_table(self):
+        strings = ["a", "", "bc"] + [""] * TABLE_SIZE * 2 + ["a"]
+        table = Table(pack(strings))
+        for code_point, string in enumerate(strings):
+            self.assertEqual(table[code_point], string)
+        self.assertEqual(table[TABLE_SIZE * 8], "")
+        self.assertEqual(table.get_index(0), table.get_index(len(strings) - 1))
+
     if SOURCE_CODE_LANGUAGE == "Cython":
         def test_cython(self):
             self.assertIsNot(unidecode, unidecode_py)
@@ -1,30 +1,64 @@
 """Pure Python version of unidecode()
 """
-from importlib import import_module
+import re
+
+from .tablefile import TABLE_SIZE, Table
 
 
-TABLE_SIZE = 0x800
-EMPTY_TABLE = [""] * TABLE_SIZE
-TABLE_MODULE_FORMAT = ".".join(__name__.split(".")[:-1] + ["tables.0x{:02x}"])
 SOURCE_CODE_LANGUAGE = "Python"
+NON_ASCII_RE = re.compile(r"[^\x00-\x7f]")
+NON_ASCII_RUN_RE = re.compile(r"[^\x00-\x7f]+")
+# Skipping ASCII runs costs a call per non-ASCII run, which only pays off
+# when fewer than one character in SPARSE_RATIO is non-ASCII.
+SAMPLE_SIZE = 0x400
+SPARSE_RATIO = 32
+
+
+class TranslationTable(dict):
+    """Translation table for str.translate(), filled a block at a time
+
+    Equal transliterations share the same string object.
+    """
+    def __init__(self):
+        self.table = None
+        self.strings = {}
+        self.update((n, chr(n)) for n in range(0x80))
+
+    def __missing__(self, code_point):
+        if self.table is None:
+            self.table = Table.open()
+        start = code_point - code_point % TABLE_SIZE
+        block = {}
+        for cp in range(start, start + TABLE_SIZE):
+            index = self.table.get_index(cp)
+            try:
+                block[cp] = self.strings[index]
+            except KeyError:
+                block[cp] = self.strings[index] = self.table.get_string(index)
+        self.update(block)
+        return block[code_point]
 
-tables = {}
+
+translation_table = TranslationTable()
 
 
 def unidecode(text: str) -> str:
     """Transliterate a Unicode object into an ASCII string.
     """
-    return "".join([c if c < "\x80" else unidecode_char(c) for c in text])
-
-
-def unidecode_char(c):
-    block, index = divmod(ord(c), TABLE_SIZE)
-    try:
-        table = tables[block]
-    except KeyError:
-        try:
-            table = import_module(TABLE_MODULE_FORMAT.format(block)).TABLE
-        except ImportError:
-            table = EMPTY_TABLE
-        tables[block] = table
-    return table[index]
+    if _isascii(text):
+        return text
+    sample = text[:SAMPLE_SIZE]
+    non_ascii_count = len(sample) - len(sample.encode("ascii", "ignore"))
+    if non_ascii_count * SPARSE_RATIO < len(sample):
+        return NON_ASCII_RUN_RE.sub(_translate_run, text)
+    return text.translate(translation_table)
+
+
+try:
+    _isascii = str.isascii
+except AttributeError:
+    _isascii = lambda text: not NON_ASCII_RE.search(text)
+
+
+def _translate_run(match):
+    return match.group().translate(translation_table)
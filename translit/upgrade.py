@@ -1,11 +1,10 @@
+import codecs
 import locale
 import re
+import threading
 import warnings
 
-try:
-    from functools import lru_cache
-except ImportError:
-    from .backports.functools import lru_cache
+from .cache import DEFAULT_MEMO_MAX_LENGTH, Memo
 
 try:
     from . import spell
@@ -61,6 +60,7 @@ TRANS_RE_SUBS = {
 }
 
 FAILSAFE_LANGUAGE = "en"
+MAX_DICTS = 5
 
 
 def upgrade(text: str, language=None) -> str:
@@ -68,19 +68,51 @@ def upgrade(text: str, language=None) -> str:
     """
     if language is None:
         language = locale.getdefaultlocale()[0]
+    cached_func = memo.get_func(text)
+    if cached_func is not None:
+        return cached_func(text, language)
+    return _upgrade(text, language)
+
+
+def _upgrade(text, language):
+    return fix_spelling(_apply_subs(text, get_subs(language)), language)
+
+
+def _apply_subs(text, subs):
+    for pattern, repl in subs:
+        text = pattern.sub(repl, text)
+    return text
 
+
+def get_subs(language) -> list:
+    """Get the substitutions upgrade() makes for a language.
+    """
     try:
-        subs = TRANS_RE_SUBS[language]
+        return TRANS_RE_SUBS[language]
     except KeyError:
         try:
-            subs = TRANS_RE_SUBS[language.split("_")[0]]
+            return TRANS_RE_SUBS[language.split("_")[0]]
         except KeyError:
-            subs = TRANS_RE_SUBS[FAILSAFE_LANGUAGE]
+            return TRANS_RE_SUBS[FAILSAFE_LANGUAGE]
+
+
+memo = Memo(_upgrade)
+
+
+def set_memo_size(max_size, max_length=DEFAULT_MEMO_MAX_LENGTH):
+    """Cache whole results of upgrade() for text up to max_length.
+
+    This saves running substitutions and the spellchecker again on the
+    same text. None lifts the limit on the number of results, and 0
+    turns this off.
+    """
+    memo.resize(max_size, max_length)
 
-    for pattern, repl in subs:
-        text = pattern.sub(repl, text)
 
-    return fix_spelling(text, language)
+def memo_info():
+    """Report statistics of the cache set by set_memo_size().
+    """
+    return memo.info()
 
 
 if spell:
@@ -91,12 +123,26 @@ if spell:
             warnings.warn(
                 "dictionary not found for language: {!r}".format(language))
 
-    @lru_cache(5)
     def get_dict(language=None):
-        return spell.Dict(language)
+        try:
+            return dicts[language]
+        except KeyError:
+            pass
+        # Dictionaries are opened once, even when threads miss them at once.
+        with dict_lock:
+            d = dicts.get(language)
+            if d is None:
+                if len(dicts) >= MAX_DICTS:
+                    del dicts[next(iter(dicts))]
+                d = dicts[language] = spell.Dict(language)
+            return d
+
+    dicts = {}
+    dict_lock = threading.Lock()
 
 else:
     fix_spelling = lambda text, language=None: text
+    get_dict = None
 
 
 def decode_factory(encoding, language=None):
@@ -104,3 +150,80 @@ def decode_factory(encoding, language=None):
         buf = bytes(input)
         return upgrade(buf.decode(encoding, errors), language), len(buf)
     return func
+
+
+class IncrementalDecoder(codecs.IncrementalDecoder):
+    """Incremental decoder that upgrades text decoded from its encoding
+
+    Text is upgraded a line at a time at least, so that substitutions
+    anchored to the start of a line don't fire at the end of each input.
+    """
+    encoding = None
+    language = None
+
+    def __init__(self, errors="strict"):
+        super().__init__(errors)
+        self.decoder = codecs.getincrementaldecoder(self.encoding)(errors)
+        self.pending = ""
+
+    def decode(self, input, final=False): #@ReservedAssignment
+        text = self.pending + self.decoder.decode(input, final)
+        if final:
+            self.pending = ""
+        else:
+            end = text.rfind("\n") + 1
+            text, self.pending = text[:end], text[end:]
+        return upgrade(text, self.language) if text else ""
+
+    def reset(self):
+        self.decoder.reset()
+        self.pending = ""
+
+
+class StreamReader(codecs.StreamReader):
+    """Stream reader that upgrades text decoded from its encoding
+
+    Reads go through the incremental decoder, so that multibyte characters
+    may span reads and text is upgraded a line at a time at least.
+    """
+    encoding = None
+    language = None
+
+    def __init__(self, stream, errors="strict"):
+        super().__init__(stream, errors)
+        self.decoder = incremental_decoder_factory(
+            self.encoding, self.language)(errors)
+
+    def read(self, size=-1, chars=-1, firstline=False):
+        if self.linebuffer:
+            self.charbuffer = "".join(self.linebuffer)
+            self.linebuffer = None
+        if chars < 0:
+            chars = size
+        while chars < 0 or len(self.charbuffer) < chars:
+            data = self.stream.read() if size < 0 else self.stream.read(size)
+            self.charbuffer += self.decoder.decode(data, not data)
+            if not data:
+                break
+        if chars < 0:
+            text, self.charbuffer = self.charbuffer, ""
+        else:
+            text, self.charbuffer = (self.charbuffer[:chars],
+                                     self.charbuffer[chars:])
+        return text
+
+    def reset(self):
+        super().reset()
+        self.decoder.reset()
+
+
+def incremental_decoder_factory(encoding, language=None):
+    return type("IncrementalDecoder", (IncrementalDecoder,),
+                {"encoding": codecs.lookup(encoding).name,
+                 "language": language})
+
+
+def stream_reader_factory(encoding, language=None):
+    return type("StreamReader", (StreamReader,),
+                {"encoding": codecs.lookup(encoding).name,
+                 "language": language})
@@ -0,0 +1,107 @@
+"""NumPy versions of downgrade() and unidecode()
+
+Text is processed as an array of code points. Python code only runs
+once for each distinct character that gets replaced.
+"""
+import codecs
+
+import numpy as np
+
+from .downgrade import (DEFAULT_ENCODING, downgrade_tables, _isascii,
+                        _get_encodable_ranges, _substitute)
+from .unidecode import unidecode as _unidecode
+
+
+CODE_SPACE_SIZE = 0x110000
+
+encodable_maps = {}
+
+
+def downgrade(text: str, encoding=DEFAULT_ENCODING) -> str:
+    """Downgrade text to fit into the specified encoding.
+
+    Same as translit.downgrade().
+    """
+    if _isascii(text):
+        return text
+    encoding = codecs.lookup(encoding).name
+    code_points = _get_code_points(text)
+    mask = _get_unencodable_mask(code_points, encoding)
+    if not mask.any():
+        return text
+    substituted = _substitute(text, encoding)
+    if substituted is not text:
+        text = substituted
+        code_points = _get_code_points(text)
+        mask = _get_unencodable_mask(code_points, encoding)
+    table = downgrade_tables[encoding]
+    if downgrade_tables.count_lookups:
+        table.add_lookups(int(mask.sum()))
+    return _translate(text, code_points, mask, table.__getitem__)
+
+
+def unidecode(text: str) -> str:
+    """Transliterate a Unicode object into an ASCII string.
+
+    Same as translit.unidecode().
+    """
+    if _isascii(text):
+        return text
+    code_points = _get_code_points(text)
+    return _translate(text, code_points, code_points >= 0x80,
+                      lambda code_point: _unidecode(chr(code_point)))
+
+
+def _get_code_points(text):
+    return np.frombuffer(text.encode("utf-32-le", "surrogatepass"),
+                         np.uint32)
+
+
+def _get_unencodable_mask(code_points, encoding):
+    try:
+        encodable_map = encodable_maps[encoding]
+    except KeyError:
+        encodable_map = encodable_maps[encoding] = np.zeros(CODE_SPACE_SIZE,
+                                                            bool)
+        for start, end in _get_encodable_ranges(encoding):
+            encodable_map[start:end] = True
+    return ~encodable_map[code_points]
+
+
+def _translate(text, code_points, mask, lookup):
+    """Replace masked code points by what lookup returns for them.
+    """
+    positions = np.flatnonzero(mask)
+    if not len(positions):
+        return text
+    # Counting is linear, unlike sorting with np.unique().
+    masked = code_points[positions]
+    present = np.zeros(int(masked.max()) + 1, bool)
+    present[masked] = True
+    chars = np.flatnonzero(present)
+    indexes = np.zeros(len(present), np.intp)
+    indexes[chars] = np.arange(len(chars))
+    inverse = indexes[masked]
+    repls = [lookup(int(code_point)) for code_point in chars]
+    pool = _get_code_points("".join(repls))
+    repl_lengths = np.array([len(repl) for repl in repls], np.intp)
+    repl_starts = np.cumsum(repl_lengths) - repl_lengths
+
+    # Where each input character goes in the result.
+    lengths = np.ones(len(code_points), np.intp)
+    counts = repl_lengths[inverse]
+    lengths[positions] = counts
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    result = np.empty(ends[-1], np.uint32)
+    kept = ~mask
+    result[starts[kept]] = code_points[kept]
+
+    # Copy replacements from the pool, one code point at a time.
+    total = counts.sum()
+    if total:
+        offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts,
+                                               counts)
+        result[np.repeat(starts[positions], counts) + offsets] = \
+            pool[np.repeat(repl_starts[inverse], counts) + offsets]
+    return result.tobytes().decode("utf-32-le", "surrogatepass")